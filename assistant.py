@@ -0,0 +1,149 @@
+"""
+Chat responses and summaries, on top of any LLMBackend.
+
+Builds the prompts (with retrieval for chat, family by family for
+summaries) and caches the responses; the backend only sends prompts. Every
+model call and cache hit is recorded in metrics, as "chat",
+"summary.family" (family sections, and merges of chunked families) or
+"summary.overall" (the global sections).
+"""
+import time
+import weakref
+from functools import partial
+
+from chat_context import build_chat_context
+from llm_backend import LLMBackend
+from metrics import get_metrics, metered_generate, metered_stream
+from response_cache import fingerprint_data, get_response_cache
+from summary_sections import IncrementalSummarizer
+
+SUMMARY_PATH = "db/summary.txt"
+
+CHAT_GUIDELINES = (
+    "Your job is to respond to the user's prompt using clear and intuitive "
+    "plaintext formatting that fits well in a window ~64 characters wide.\n\n"
+    "FORMATTING GUIDELINES:\n"
+    "- Use ALL-CAPS for major headers\n"
+    "- Use hanging indents: when a line wraps, indent it with 6 spaces so it's aligned with "
+    "the text after the bullet or number, NOT under the bullet/number itself\n"
+    "- Use dashes ( - ) for lists and bullet points\n"
+    "- Use paragraphs for explanations and grouped analysis\n"
+    "- Avoid any markdown formatting (no asterisks, hashes, underscores, etc.)\n"
+    "- Use hex codes when referencing colors\n"
+    "- Keep line length around 70 characters for readability\n"
+    "- Use consistent spacing and line breaks\n\n"
+)
+
+# One summarizer per backend, so each keeps its own last_run
+_summarizers = weakref.WeakKeyDictionary()
+
+
+# ---------- Summaries ----------
+
+def get_summarizer(backend: LLMBackend):
+    """The backend's summarizer; its last_run holds the families redone and per-stage timings of the last summary"""
+    summarizer = _summarizers.get(backend)
+    if summarizer is None:
+        summarizer = _summarizers[backend] = IncrementalSummarizer(
+            partial(metered_generate, backend, "summary.family"),
+            partial(metered_stream, backend, "summary.overall"),
+            model=backend.model,
+        )
+    return summarizer
+
+
+def generate_summary_text(backend: LLMBackend, data):
+    """
+    Summarize the database family by family; only families whose entries
+    changed since the last summary are sent to the model again
+    """
+    return get_summarizer(backend).summarize(data)
+
+
+def stream_summary_text(backend: LLMBackend, data):
+    """Like generate_summary_text, but yields the text in chunks as they are ready"""
+    return get_summarizer(backend).stream(data)
+
+
+def write_summary_file(summary):
+    with open(SUMMARY_PATH, "w", encoding="utf-8") as f:
+        f.write(summary)
+
+
+def update_summary_file(backend: LLMBackend, data):
+    summary = generate_summary_text(backend, data)
+    write_summary_file(summary)
+    return summary
+
+
+# ---------- Chat ----------
+
+def build_chat_prompt(prompt, data):
+    # Large databases are cut down to the entries relevant to this prompt
+    db_text, complete = build_chat_context(prompt, data)
+    if complete:
+        intro = ("You are a thoughtful assistant trained on the following database of "
+                 "synesthetic color associations:\n\n")
+    else:
+        intro = ("You are a thoughtful assistant trained on a database of synesthetic "
+                 "color associations. Below are an overview of the whole database and "
+                 "the entries most relevant to the prompt:\n\n")
+    return intro + f"{db_text}\n\n" + CHAT_GUIDELINES + f"Prompt: {prompt}"
+
+
+def generate_chat_response(backend: LLMBackend, prompt, data):
+    return generate_text(backend, "chat", CHAT_GUIDELINES + prompt, data, lambda: build_chat_prompt(prompt, data))
+
+
+def stream_chat_response(backend: LLMBackend, prompt, data):
+    """Like generate_chat_response, but yields the text in chunks as they arrive"""
+    return stream_text(backend, "chat", CHAT_GUIDELINES + prompt, data, lambda: build_chat_prompt(prompt, data))
+
+
+# ---------- Cached requests ----------
+# Responses are cached by the request's fixed instructions (plus the question,
+# for chat) and a fingerprint of the data, so the full prompt, which can be
+# slow to build for a large database, is only built on a cache miss. Only chat
+# responses are cached; summaries reuse their stored sections instead.
+
+CACHED_OPERATIONS = ("chat",)
+
+def generate_text(backend: LLMBackend, operation, cache_prompt, data, build_prompt):
+    cache = get_response_cache()
+    started = time.perf_counter()
+    fingerprint = fingerprint_data(data)
+    cached = cache.get(backend.model, operation, cache_prompt, fingerprint)
+    if cached is not None:
+        get_metrics().record_cache_hit(backend, operation, cached, time.perf_counter() - started)
+        return cached
+
+    text = metered_generate(backend, operation, build_prompt())
+    if text:
+        cache.put(backend.model, operation, cache_prompt, fingerprint, text)
+    return text
+
+
+def stream_text(backend: LLMBackend, operation, cache_prompt, data, build_prompt):
+    cache = get_response_cache()
+    started = time.perf_counter()
+    fingerprint = fingerprint_data(data)
+    cached = cache.get(backend.model, operation, cache_prompt, fingerprint)
+    if cached is not None:
+        get_metrics().record_cache_hit(backend, operation, cached, time.perf_counter() - started)
+        yield cached
+        return
+
+    parts = []
+    for chunk in metered_stream(backend, operation, build_prompt()):
+        parts.append(chunk)
+        yield chunk
+    # Only a response that streamed to the end is cached
+    if parts:
+        cache.put(backend.model, operation, cache_prompt, fingerprint, "".join(parts))
+
+
+def clear_response_cache(operation=None):
+    """Forget cached responses (all, or those for one of CACHED_OPERATIONS); returns how many were removed"""
+    if operation is not None and operation not in CACHED_OPERATIONS:
+        raise ValueError(f"Responses are not cached for {operation!r}")
+    return get_response_cache().invalidate(operation=operation)
@@ -0,0 +1,639 @@
+import json
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+
+# Storage paths
+STORE_PATH = "db/associations.db"
+LEGACY_JSON_PATHS = ("db/associations.json", "db/associations_backup.json")
+
+# The process umask, for the permissions of newly created files (it can only be read by setting it)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Journal compaction thresholds
+COMPACT_JOURNAL_BYTES = 4 * 1024 * 1024
+COMPACT_JOURNAL_COMMITS = 500
+COMPACT_CHECK_INTERVAL = 5.0
+
+# Final flush on shutdown: attempts, and seconds between them
+STOP_FLUSH_ATTEMPTS = 3
+STOP_RETRY_DELAY = 0.2
+
+
+_UPSERT_SQL = (
+    "INSERT INTO associations (hex, xkcd_name, associations) VALUES (?, ?, ?) "
+    "ON CONFLICT(hex) DO UPDATE SET "
+    " hex = excluded.hex,"
+    " xkcd_name = excluded.xkcd_name,"
+    " associations = excluded.associations"
+)
+
+
+class AssociationStore:
+    """
+    SQLite-backed storage for color associations.
+
+    Entries are keyed by hex code (case-insensitive primary key), so upserts and
+    deletes are indexed O(log N) operations that run in their own transaction
+    instead of rewriting the whole database. Insertion order is preserved through
+    the table's rowid, which matches the order of the old JSON list.
+
+    The database runs in write-ahead-log mode: each commit appends only the
+    changed pages to the `-wal` journal, and a background JournalCompactor folds
+    the journal back into the main file once it grows past a size or commit
+    threshold. Opening the store replays any journal left behind by a crash,
+    so an interrupted write never truncates the database.
+    """
+
+    def __init__(self, path=STORE_PATH, legacy_paths=LEGACY_JSON_PATHS):
+        self.path = path
+        self.legacy_paths = legacy_paths
+        self._conn = None
+        self._lock = threading.RLock()
+        # Bumped on every write so in-memory views know when they are stale
+        self.generation = 0
+        self.commits_since_compaction = 0
+        self._compactor = None
+        # Called with (signature before, signature after) once compact() checkpoints the journal
+        self._compaction_listeners = []
+
+    # ---------- Connection ----------
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            # Automatic checkpoints are replaced by the background compactor
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA wal_autocheckpoint=0")
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS associations ("
+                    " hex TEXT PRIMARY KEY COLLATE NOCASE,"
+                    " xkcd_name TEXT NOT NULL DEFAULT '',"
+                    " associations TEXT NOT NULL DEFAULT '')"
+                )
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn = conn
+            try:
+                self._import_legacy_json()
+            except Exception as e:
+                # Nothing was committed; the import is retried the next time the store is opened
+                print(f"Could not import the old associations database: {e}")
+        return self._conn
+
+    def _import_legacy_json(self):
+        """
+        Import the first readable legacy JSON database, once.
+
+        The entries and the "imported" flag are committed in one transaction,
+        so an import that fails is simply tried again on the next open. Stores
+        that already hold associations (e.g. created before the flag existed)
+        are only flagged, never overwritten with the older JSON data.
+        """
+        conn = self._conn
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return 0
+        entries = []
+        if not conn.execute("SELECT 1 FROM associations LIMIT 1").fetchone():
+            for legacy_path in self.legacy_paths:
+                entries = _read_json_list(legacy_path)
+                if entries:
+                    break
+        rows = [(e["hex"], e.get("xkcd_name", ""), e.get("associations", "")) for e in entries]
+        with conn:
+            conn.executemany(_UPSERT_SQL, rows)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', ?)", (str(len(rows)),))
+        if rows:
+            self._committed()
+        return len(rows)
+
+    @property
+    def journal_path(self):
+        return self.path + "-wal"
+
+    def journal_size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except OSError:
+            return 0
+
+    def file_signature(self):
+        """(mtime, size) of the database file and its journal; commits land in the journal first"""
+        signature = []
+        for path in (self.path, self.journal_path):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def add_compaction_listener(self, callback):
+        """Call callback(before, after) with the file signatures around every compaction"""
+        self._compaction_listeners.append(callback)
+
+    def compact(self):
+        """Fold the write-ahead journal into the main database file and truncate it"""
+        with self._lock:
+            if self._conn is None:
+                return
+            before = self.file_signature()
+            self._checkpoint()
+            after = self.file_signature()
+        # Outside the lock: listeners take their own locks, which are held around store reads
+        for callback in self._compaction_listeners:
+            callback(before, after)
+
+    def _checkpoint(self):
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.commits_since_compaction = 0
+
+    def start_compactor(self, max_bytes=COMPACT_JOURNAL_BYTES, max_commits=COMPACT_JOURNAL_COMMITS,
+                        interval=COMPACT_CHECK_INTERVAL):
+        """Start the background journal compactor (no-op if it is already running)"""
+        if self._compactor is None:
+            self._compactor = JournalCompactor(self, max_bytes, max_commits, interval)
+            self._compactor.start()
+        return self._compactor
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.stop()
+            self._compactor = None
+        with self._lock:
+            if self._conn is not None:
+                self._checkpoint()
+                self._conn.close()
+                self._conn = None
+
+    # ---------- Reads ----------
+
+    def all(self):
+        """Return every entry as a list of dicts, in insertion order"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT hex, xkcd_name, associations FROM associations ORDER BY rowid"
+            ).fetchall()
+        return [_row_to_entry(row) for row in rows]
+
+    def get(self, hex_code):
+        """Return the entry for hex_code, or None if it has no association"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT hex, xkcd_name, associations FROM associations WHERE hex = ?",
+                (hex_code,)
+            ).fetchone()
+        return _row_to_entry(row) if row else None
+
+    def count(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM associations").fetchone()[0]
+
+    # ---------- Writes ----------
+
+    def upsert(self, entry):
+        self.apply_changes(upserts=[entry])
+
+    def upsert_many(self, entries):
+        """Insert or update entries in a single transaction"""
+        self.apply_changes(upserts=entries)
+
+    def delete(self, hex_code):
+        self.apply_changes(deletes=[hex_code])
+
+    def delete_many(self, hex_codes):
+        """Delete entries by hex code in a single transaction"""
+        self.apply_changes(deletes=hex_codes)
+
+    def apply_changes(self, upserts=(), deletes=()):
+        """Apply deletes, then upserts, atomically in one transaction"""
+        rows = [
+            (e["hex"], e.get("xkcd_name", ""), e.get("associations", ""))
+            for e in upserts
+        ]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "DELETE FROM associations WHERE hex = ?",
+                    [(hex_code,) for hex_code in deletes]
+                )
+                conn.executemany(_UPSERT_SQL, rows)
+            self._committed()
+
+    def _committed(self):
+        self.generation += 1
+        self.commits_since_compaction += 1
+        if self._compactor is not None:
+            self._compactor.poke()
+
+
+class JournalCompactor(threading.Thread):
+    """
+    Background thread that checkpoints an AssociationStore's write-ahead journal.
+
+    Compaction runs when the journal exceeds max_bytes or max_commits commits,
+    checked after every commit and every `interval` seconds.
+    """
+
+    def __init__(self, store, max_bytes, max_commits, interval):
+        super().__init__(name="association-journal-compactor", daemon=True)
+        self.store = store
+        self.max_bytes = max_bytes
+        self.max_commits = max_commits
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def poke(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        self.join()
+
+    def should_compact(self):
+        return (self.store.commits_since_compaction >= self.max_commits
+                or self.store.journal_size() >= self.max_bytes)
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            if self.should_compact():
+                try:
+                    self.store.compact()
+                except sqlite3.Error as e:
+                    print(f"Could not compact association journal: {e}")
+
+
+class AssociationRepository:
+    """
+    Shared in-memory view of an AssociationStore.
+
+    Holds a hex-indexed dict of every entry so repeated reads are dict lookups
+    with no disk I/O. The cache is reloaded when the store's generation changes
+    or when the database file's mtime/size no longer match (e.g. another process
+    wrote it).
+
+    Writes are applied to the cached copy immediately. With a WriteBehindFlusher
+    attached they are queued and persisted in batches on the flusher's thread;
+    without one they are written through to the store before returning.
+    """
+
+    def __init__(self, store, flusher=None):
+        self.store = store
+        self.flusher = flusher
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._entries = None
+        self._generation = None
+        self._signature = None
+        # key -> entry, or None for a delete; _inflight is being written right now
+        self._pending = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        store.add_compaction_listener(self._compacted)
+
+    def _file_signature(self):
+        return self.store.file_signature()
+
+    def _ensure_loaded(self):
+        signature = self._file_signature()
+        if (self._entries is not None
+                and self._generation == self.store.generation
+                and self._signature == signature):
+            self.hits += 1
+            return self._entries
+
+        self.misses += 1
+        entries = {e["hex"].lower(): e for e in self.store.all()}
+        # Changes that have not reached the store yet still win
+        for changes in (self._inflight, self._pending):
+            for key, entry in changes.items():
+                if entry is None:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = entry
+        self._entries = entries
+        self._generation = self.store.generation
+        self._signature = self._file_signature()
+        return self._entries
+
+    def _mark_synced(self):
+        self._generation = self.store.generation
+        self._signature = self._file_signature()
+
+    def _compacted(self, before, after):
+        # A checkpoint rewrites both files without changing their contents; a
+        # cache that matched them before still does, so it is not reloaded
+        with self._lock:
+            if self._entries is not None and self._signature == before:
+                self._signature = after
+
+    # ---------- Reads ----------
+
+    def all(self):
+        """Return every entry in insertion order (entries are shared; do not mutate them)"""
+        with self._lock:
+            return list(self._ensure_loaded().values())
+
+    def get(self, hex_code):
+        with self._lock:
+            return self._ensure_loaded().get(hex_code.lower())
+
+    def __contains__(self, hex_code):
+        with self._lock:
+            return hex_code.lower() in self._ensure_loaded()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ensure_loaded())
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "pending_writes": len(self._pending)}
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = None
+
+    # ---------- Writes ----------
+
+    def upsert(self, entry):
+        self.upsert_many([entry])
+
+    def upsert_many(self, entries):
+        with self._lock:
+            cached = self._ensure_loaded()
+            for entry in entries:
+                entry = dict(entry)
+                key = entry["hex"].lower()
+                # Existing keys keep their position, matching the store's rowid order
+                cached[key] = entry
+                self._pending[key] = entry
+        self._schedule_flush()
+
+    def delete(self, hex_code):
+        self.delete_many([hex_code])
+
+    def delete_many(self, hex_codes):
+        with self._lock:
+            cached = self._ensure_loaded()
+            for hex_code in hex_codes:
+                key = hex_code.lower()
+                cached.pop(key, None)
+                self._pending[key] = None
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self.flusher is not None:
+            self.flusher.schedule(self)
+        else:
+            self.flush()
+
+    def flush(self):
+        """Write every queued change to the store in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                self._inflight, self._pending = self._pending, {}
+                changes = self._inflight
+            try:
+                self.store.apply_changes(
+                    upserts=[e for e in changes.values() if e is not None],
+                    deletes=[key for key, e in changes.items() if e is None],
+                )
+            except Exception:
+                # Put the batch back and schedule another flush to retry it
+                with self._lock:
+                    self._pending = {**changes, **self._pending}
+                    self._inflight = {}
+                if self.flusher is not None:
+                    self.flusher.schedule(self)
+                raise
+            with self._lock:
+                self._inflight = {}
+                if self._entries is not None:
+                    self._mark_synced()
+
+
+class JsonListStore:
+    """
+    A JSON list of hex-keyed entries held in memory and saved atomically.
+
+    Changes are made to the in-memory list immediately; saving writes a temp
+    file next to the target and renames it into place, so readers never see a
+    half-written file. Saving is deferred to a WriteBehindFlusher when one is
+    attached.
+    """
+
+    def __init__(self, path, flusher=None):
+        self.path = path
+        self.flusher = flusher
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+
+    def _ensure_loaded(self):
+        if self._entries is None:
+            self._entries = _read_json_list(self.path)
+        return self._entries
+
+    def all(self):
+        with self._lock:
+            return list(self._ensure_loaded())
+
+    def add(self, entry):
+        """Append entry unless one with the same hex is already present; returns True if added"""
+        with self._lock:
+            entries = self._ensure_loaded()
+            if any(e["hex"] == entry["hex"] for e in entries):
+                return False
+            entries.append(dict(entry))
+            self._dirty = True
+        self._schedule_flush()
+        return True
+
+    def remove_many(self, hex_codes):
+        """Remove entries by hex code; returns the hex codes that were actually removed"""
+        hex_codes = set(hex_codes)
+        with self._lock:
+            entries = self._ensure_loaded()
+            removed = [e["hex"] for e in entries if e["hex"] in hex_codes]
+            if not removed:
+                return []
+            self._entries = [e for e in entries if e["hex"] not in hex_codes]
+            self._dirty = True
+        self._schedule_flush()
+        return removed
+
+    def _schedule_flush(self):
+        if self.flusher is not None:
+            self.flusher.schedule(self)
+        else:
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                snapshot = list(self._entries)
+                self._dirty = False
+            try:
+                write_json_atomic(self.path, snapshot)
+            except Exception:
+                with self._lock:
+                    self._dirty = True
+                if self.flusher is not None:
+                    self.flusher.schedule(self)
+                raise
+
+
+class WriteBehindFlusher(threading.Thread):
+    """
+    Worker thread that coalesces rapid writes into batched flushes.
+
+    Targets (objects with a thread-safe flush() method) are scheduled after each
+    change. The worker waits until no new change has arrived for `delay` seconds,
+    or until `max_delay` seconds have passed since the first one, then flushes
+    every scheduled target. Call flush() to persist everything synchronously,
+    e.g. when the app exits. A target whose flush fails schedules itself
+    again, so its changes are retried rather than dropped.
+    """
+
+    def __init__(self, delay=0.5, max_delay=5.0):
+        super().__init__(name="association-write-behind", daemon=True)
+        self.delay = delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._scheduled = []
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._first_change = None
+        self._last_change = None
+
+    def schedule(self, target):
+        with self._lock:
+            if target not in self._scheduled:
+                self._scheduled.append(target)
+            now = time.monotonic()
+            if self._first_change is None:
+                self._first_change = now
+            self._last_change = now
+        self._wake.set()
+
+    def flush(self):
+        """Flush every scheduled target now, on the calling thread; raises the first failure"""
+        with self._lock:
+            targets, self._scheduled = self._scheduled, []
+            self._first_change = self._last_change = None
+        errors = []
+        # One failing target doesn't stop the others from being written
+        for target in targets:
+            try:
+                target.flush()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        if self.is_alive():
+            self.join()
+        # Failed targets reschedule themselves; give transient errors (a locked database) a few more tries
+        for attempt in range(STOP_FLUSH_ATTEMPTS):
+            try:
+                self.flush()
+                return
+            except Exception:
+                if attempt == STOP_FLUSH_ATTEMPTS - 1:
+                    raise
+                time.sleep(STOP_RETRY_DELAY)
+
+    def _due_in(self):
+        with self._lock:
+            if self._first_change is None:
+                return None
+            now = time.monotonic()
+            return min(self._last_change + self.delay, self._first_change + self.max_delay) - now
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            due_in = self._due_in()
+            while due_in is not None and due_in > 0 and not self._stopped.is_set():
+                self._wake.wait(due_in)
+                self._wake.clear()
+                due_in = self._due_in()
+            if self._stopped.is_set():
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Could not save pending changes: {e}")
+
+
+def _row_to_entry(row):
+    return {"hex": row[0], "xkcd_name": row[1], "associations": row[2]}
+
+
+def _file_mode(path):
+    """Permissions for a new version of path: those of the current file, or the umask's default for new files"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def write_json_atomic(path, data, indent=4, ensure_ascii=True):
+    """Write data as JSON to a temp file, then rename it over path, so readers never see a half-written file"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        # mkstemp creates the file owner-only (0600); keep the file's usual permissions
+        os.chmod(tmp_path, _file_mode(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=indent, ensure_ascii=ensure_ascii)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_json_list(path):
+    """Read a JSON list from path, returning [] if it is missing, empty or corrupt"""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r") as f:
+            content = f.read().strip()
+            if not content:
+                return []
+            data = json.loads(content)
+    except json.JSONDecodeError:
+        return []
+    return data if isinstance(data, list) else []
@@ -0,0 +1,234 @@
+"""
+Retrieval stage for chat prompts.
+
+Rather than pasting the whole database into every chat prompt, the entries
+are scored against the question and only the most relevant ones are sent,
+together with a compact per-family overview of everything else, so the
+prompt stays within a fixed token budget however large the database grows.
+Databases that fit the budget are still sent whole.
+"""
+import re
+from collections import Counter, defaultdict
+
+from color_catalog import get_xkcd_catalog
+from color_distance import within
+from search_index import tokenize
+from token_estimate import estimate_tokens
+from utils import COLOR_FAMILIES, NEUTRAL_FAMILY, association_term_scores, get_color_family, get_color_sort_key
+
+# Approximate prompt size allowed for the database part of a chat prompt
+CONTEXT_TOKEN_BUDGET = 8000
+# Most entries listed individually when the database doesn't fit the budget
+TOP_K = 150
+
+# Colors within this ΔE (CIEDE2000) of a color mentioned in the prompt count as related
+MENTION_DELTA_E = 12.0
+# Terms listed per family in the overview
+FAMILY_TERMS = 6
+
+# Score weights, on top of the BM25 score of the prompt's words
+HEX_WEIGHT = 10.0
+NAME_WEIGHT = 6.0
+NEAR_WEIGHT = 5.0  # scaled down linearly to 0 at MENTION_DELTA_E
+FAMILY_WEIGHT = 1.5
+
+# Only with the "#": six bare letters a-f are as likely to be a word ("decade") as a color
+_HEX_RE = re.compile(r"#([0-9a-f]{6})(?![0-9a-f])")
+# Longest color name (in words) looked up in the palette
+_MAX_NAME_WORDS = 3
+
+# Words naming a family (or group of families), matched in singular or plural
+FAMILY_KEYWORDS = {
+    "pink": ("pinks",),
+    "red": ("reds",),
+    "orange": ("oranges",),
+    "brown": ("oranges", "reds"),
+    "yellow": ("yellows",),
+    "gold": ("yellows",),
+    "lime": ("yellow-greens",),
+    "green": ("yellow-greens", "greens", "blue-greens"),
+    "teal": ("blue-greens", "cyans"),
+    "turquoise": ("blue-greens", "cyans"),
+    "cyan": ("cyans",),
+    "aqua": ("cyans",),
+    "blue": ("sky blues", "blues"),
+    "navy": ("blues",),
+    "purple": ("purples",),
+    "violet": ("purples",),
+    "lavender": ("purples",),
+    "magenta": ("magentas",),
+    "fuchsia": ("magentas",),
+    "grey": (NEUTRAL_FAMILY,),
+    "gray": (NEUTRAL_FAMILY,),
+    "neutral": (NEUTRAL_FAMILY,),
+    "black": (NEUTRAL_FAMILY,),
+    "white": (NEUTRAL_FAMILY,),
+    "warm": ("pinks", "reds", "oranges", "yellows"),
+    "cool": ("greens", "blue-greens", "cyans", "sky blues", "blues", "purples"),
+}
+
+# "-ish" forms whose stem isn't simply the word minus "ish"
+ISH_FORMS = {
+    "bluish": "blue",
+    "reddish": "red",
+    "purplish": "purple",
+    "whitish": "white",
+    "orangish": "orange",
+}
+
+STOP_WORDS = frozenset("""
+    a about above after again all also am an and any are as at be because been
+    being below between both but by can color colors colour colours could did do
+    does doing down during each feel feels few for from further had has have
+    having he her here hers him his how i if in into is it its itself just like
+    make me more most my no nor not now of off on once only or other our out over
+    own same she should so some such than that the their them then there these
+    they this those through to too under until up very was we were what when
+    where which while who whom why will with would you your
+""".split())
+
+
+def format_entry(entry):
+    return f"{entry['xkcd_name']} ({entry['hex']}): {entry['associations']}"
+
+
+def mentioned_hexes(prompt):
+    """Hex codes written in the prompt, plus the palette colors it names"""
+    text = prompt.lower()
+    hexes = {"#" + code for code in _HEX_RE.findall(text)}
+    words = re.findall(r"[a-z]+", text)
+    catalog = get_xkcd_catalog()
+    for size in range(1, _MAX_NAME_WORDS + 1):
+        for i in range(len(words) - size + 1):
+            if size == 1 and words[i] in STOP_WORDS:
+                continue
+            color = catalog.by_name.get(" ".join(words[i:i + size]))
+            if color is not None:
+                hexes.add(color.hex)
+    return hexes
+
+
+def mentioned_families(tokens):
+    """Families named by tokens ("reds", "bluish", "warm"...)"""
+    families = set()
+    for token in tokens:
+        token = ISH_FORMS.get(token, token)
+        for suffix in ("", "s", "es", "ish"):
+            word = token[:len(token) - len(suffix)]
+            if token.endswith(suffix) and word in FAMILY_KEYWORDS:
+                families.update(FAMILY_KEYWORDS[word])
+    return families
+
+
+def score_entries(prompt, data):
+    """
+    Return {hex: relevance} for the entries related to prompt.
+
+    Entries score for: being a color whose hex the prompt contains, having
+    their name mentioned, being perceptually close to a color the prompt
+    mentions (by hex or palette name), belonging to a family it names
+    ("reds", "warm colors"), and sharing words with it (BM25 over the
+    descriptions, so rare, distinctive words count the most).
+    """
+    tokens = [t for t in tokenize(prompt) if t not in STOP_WORDS]
+    scores = defaultdict(float)
+
+    # The shared index covers the whole database; data may be a part of it
+    keys = {entry["hex"].lower() for entry in data}
+    for key, score in association_term_scores(tokens).items():
+        if key in keys:
+            scores[key] += score
+
+    text = " " + " ".join(re.findall(r"[a-z0-9]+", prompt.lower())) + " "
+    for entry in data:
+        name = " ".join(re.findall(r"[a-z0-9]+", entry["xkcd_name"].lower()))
+        if name and f" {name} " in text:
+            scores[entry["hex"].lower()] += NAME_WEIGHT
+
+    for hex_code in mentioned_hexes(prompt):
+        for entry, delta_e in within(hex_code, data, MENTION_DELTA_E):
+            key = entry["hex"].lower()
+            if key == hex_code:
+                scores[key] += HEX_WEIGHT
+            scores[key] += NEAR_WEIGHT * (1 - delta_e / MENTION_DELTA_E)
+
+    families = mentioned_families(tokens)
+    if families:
+        for entry in data:
+            if get_color_family(entry["hex"]) in families:
+                scores[entry["hex"].lower()] += FAMILY_WEIGHT
+
+    return scores
+
+
+def family_overview(data):
+    """One line per color family: how many colors it has and its most common description words"""
+    members = defaultdict(list)
+    for entry in data:
+        members[get_color_family(entry["hex"])].append(entry)
+
+    lines = []
+    for family in COLOR_FAMILIES:
+        entries = members.get(family)
+        if not entries:
+            continue
+        # Document frequency, so one long description can't dominate its family
+        counts = Counter()
+        for entry in entries:
+            counts.update({t for t in tokenize(entry["associations"]) if len(t) > 2 and t not in STOP_WORDS})
+        terms = ", ".join(term for term, _ in counts.most_common(FAMILY_TERMS))
+        lines.append(f"{family.capitalize()} ({len(entries)} colors): {terms}")
+    return "\n".join(lines)
+
+
+def _diverse_order(entries):
+    """Entries interleaved across families (each in rainbow order), so any prefix spans the palette"""
+    by_family = defaultdict(list)
+    for entry in sorted(entries, key=lambda e: get_color_sort_key(e["hex"])):
+        by_family[get_color_family(entry["hex"])].append(entry)
+    queues = [by_family[family] for family in COLOR_FAMILIES if by_family[family]]
+    ordered = []
+    for i in range(max(map(len, queues), default=0)):
+        ordered.extend(queue[i] for queue in queues if i < len(queue))
+    return ordered
+
+
+def build_chat_context(prompt, data, token_budget=CONTEXT_TOKEN_BUDGET, top_k=TOP_K):
+    """
+    Return (context text, whether it lists the whole database).
+
+    If every entry fits token_budget they are all listed, as before. Otherwise
+    the text is a per-family overview of the whole database followed by up to
+    top_k entries: those most relevant to prompt first, then a spread of the
+    remaining families, as long as the budget allows.
+    """
+    lines = [format_entry(e) for e in data]
+    full_text = "\n".join(lines)
+    if estimate_tokens(full_text) <= token_budget:
+        return full_text, True
+
+    overview = family_overview(data)
+    budget = token_budget - estimate_tokens(overview)
+
+    scores = score_entries(prompt, data)
+    relevant = sorted((e for e in data if e["hex"].lower() in scores), key=lambda e: -scores[e["hex"].lower()])
+    others = _diverse_order([e for e in data if e["hex"].lower() not in scores])
+
+    selected = []
+    for entry in relevant + others:
+        if len(selected) >= top_k:
+            break
+        line = format_entry(entry)
+        cost = estimate_tokens(line + "\n")
+        if cost > budget:
+            continue
+        selected.append(line)
+        budget -= cost
+
+    context = (
+        f"OVERVIEW OF ALL {len(data)} COLORS BY FAMILY (most common description words):\n"
+        f"{overview}\n\n"
+        f"SELECTED COLORS (most relevant to the prompt first):\n"
+        + "\n".join(selected)
+    )
+    return context, False
@@ -0,0 +1,82 @@
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+from utils import get_color_sort_key, hex_to_hsv, relative_luminance
+
+NamedColor = namedtuple("NamedColor", ["name", "hex", "hsv", "luminance", "sort_key"])
+
+
+class ColorCatalog:
+    """
+    Immutable lookup tables for a named color palette.
+
+    Built once from a {name: hex} mapping; names are stored without their
+    palette prefix (e.g. "xkcd:") and both names and hex codes are normalized
+    to lowercase, so name→hex and hex→name lookups are single dict lookups.
+    Each color also carries its precomputed HSV, relative luminance and
+    rainbow sort key.
+    """
+
+    def __init__(self, named_hexes, prefix=""):
+        colors = []
+        by_name = {}
+        by_hex = {}
+        for raw_name, hex_code in named_hexes.items():
+            name = normalize_name(raw_name, prefix)
+            hex_code = hex_code.lower()
+            color = NamedColor(
+                name=name,
+                hex=hex_code,
+                hsv=hex_to_hsv(hex_code),
+                luminance=relative_luminance(hex_code),
+                sort_key=get_color_sort_key(hex_code),
+            )
+            colors.append(color)
+            by_name.setdefault(name, color)
+            # The first name listed for a hex wins, as with the old list-comprehension lookups
+            by_hex.setdefault(hex_code, color)
+
+        self.prefix = prefix
+        self.colors = tuple(colors)
+        self.by_name = MappingProxyType(by_name)
+        self.by_hex = MappingProxyType(by_hex)
+        self.rainbow_order = tuple(sorted(colors, key=lambda c: c.sort_key))
+
+    def __len__(self):
+        return len(self.colors)
+
+    def __iter__(self):
+        return iter(self.colors)
+
+    def hexes(self):
+        return [c.hex for c in self.colors]
+
+    def name_for_hex(self, hex_code, default="unknown"):
+        color = self.by_hex.get(hex_code.lower())
+        return color.name if color else default
+
+    def hex_for_name(self, name, default=None):
+        color = self.by_name.get(normalize_name(name, self.prefix))
+        return color.hex if color else default
+
+
+def normalize_name(name, prefix=""):
+    name = name.strip().lower()
+    if prefix and name.startswith(prefix):
+        name = name[len(prefix):]
+    return name
+
+
+@lru_cache(maxsize=None)
+def get_xkcd_catalog():
+    """Return the shared catalog of XKCD colors (loaded on first use)"""
+    import palette_data
+    return ColorCatalog(palette_data.parse_table(palette_data.XKCD_TABLE), prefix="xkcd:")
+
+
+@lru_cache(maxsize=None)
+def get_css4_catalog():
+    """Return the shared catalog of CSS4 named colors (loaded on first use)"""
+    import palette_data
+    return ColorCatalog(palette_data.parse_table(palette_data.CSS4_TABLE))
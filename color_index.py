@@ -0,0 +1,194 @@
+import heapq
+import math
+from collections import namedtuple
+from functools import lru_cache
+
+from color_catalog import get_css4_catalog, get_xkcd_catalog
+from utils import hex_to_lab
+
+ColorMatch = namedtuple("ColorMatch", ["name", "hex", "delta_e"])
+
+# Matches closer than this are treated as the color itself
+EXACT_DELTA_E = 0.05
+
+
+class _Node:
+    __slots__ = ("point", "item", "axis", "left", "right", "removed")
+
+    def __init__(self, point, item):
+        self.point = point
+        self.item = item
+        self.axis = 0
+        self.left = None
+        self.right = None
+        self.removed = False
+
+
+class KDTree:
+    """
+    3-d tree for nearest-neighbour queries over (point, item) pairs.
+
+    Built balanced by median splits. add() attaches new points as leaves and
+    remove() only marks their node, so the tree can follow a changing set of
+    colors without rebuilding on every change; it is rebuilt (re-linking the
+    same nodes, so handles stay valid) once removed nodes outnumber live ones.
+    """
+
+    def __init__(self, points=()):
+        nodes = [_Node(point, item) for point, item in points]
+        self._size = len(nodes)
+        self._removed = 0
+        self._root = self._build(nodes, 0)
+
+    def __len__(self):
+        return self._size
+
+    def _build(self, nodes, depth):
+        if not nodes:
+            return None
+        axis = depth % 3
+        nodes.sort(key=lambda n: n.point[axis])
+        middle = len(nodes) // 2
+        node = nodes[middle]
+        node.axis = axis
+        node.left = self._build(nodes[:middle], depth + 1)
+        node.right = self._build(nodes[middle + 1:], depth + 1)
+        return node
+
+    def nodes(self):
+        """Iterate over the live nodes (node.item is the item they were added with)"""
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            if not node.removed:
+                yield node
+            stack.extend(child for child in (node.left, node.right) if child)
+
+    def add(self, point, item):
+        """Insert a point; returns its node (the handle for remove())"""
+        self._size += 1
+        new = _Node(point, item)
+        if self._root is None:
+            self._root = new
+            return new
+        node = self._root
+        while True:
+            side = "left" if point[node.axis] < node.point[node.axis] else "right"
+            child = getattr(node, side)
+            if child is None:
+                new.axis = (node.axis + 1) % 3
+                setattr(node, side, new)
+                return new
+            node = child
+
+    def remove(self, node):
+        if node.removed:
+            return
+        node.removed = True
+        self._size -= 1
+        self._removed += 1
+        if self._removed > self._size:
+            self._removed = 0
+            self._root = self._build(list(self.nodes()), 0)
+
+    def nearest(self, point, k=1, accept=None):
+        """
+        Return up to k (distance, item) pairs closest to point, nearest first.
+
+        accept(item), if given, filters candidates (e.g. to skip the query
+        color itself) without giving up the tree's pruning.
+        """
+        best = []  # max-heap of (-squared distance, tiebreak, item)
+        counter = 0
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if isinstance(node, tuple):
+                # Deferred far branch: skip it if the splitting plane is already too far
+                plane_distance, far = node
+                if len(best) == k and plane_distance >= -best[0][0]:
+                    continue
+                stack.append(far)
+                continue
+
+            if not node.removed and (accept is None or accept(node.item)):
+                d2 = sum((p - q) ** 2 for p, q in zip(point, node.point))
+                counter += 1
+                if len(best) < k:
+                    heapq.heappush(best, (-d2, counter, node.item))
+                elif d2 < -best[0][0]:
+                    heapq.heapreplace(best, (-d2, counter, node.item))
+
+            diff = point[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            # Visit the near side first; the far side only if it can still hold a closer point
+            if far is not None:
+                stack.append((diff * diff, far))
+            stack.append(near)
+
+        return [(math.sqrt(-d2), item) for d2, _, item in sorted(best, reverse=True)]
+
+
+class NearestColorIndex:
+    """
+    Perceptual nearest-color lookups over a set of hex colors.
+
+    Colors are indexed by their CIELAB coordinates, so distances are CIE76
+    ΔE*ab (about 2.3 is a just-noticeable difference). Entries are keyed by
+    lowercase hex and can be added and removed as the set changes.
+    """
+
+    def __init__(self, items=()):
+        """items: (hex, value) pairs; value is returned with each match"""
+        self._tree = KDTree((hex_to_lab(hex_code), (hex_code.lower(), value)) for hex_code, value in items)
+        self._nodes = {node.item[0]: node for node in self._tree.nodes()}
+
+    def __len__(self):
+        return len(self._tree)
+
+    def add(self, hex_code, value):
+        """Index value under hex_code, replacing any previous value for that color"""
+        self.remove(hex_code)
+        key = hex_code.lower()
+        self._nodes[key] = self._tree.add(hex_to_lab(key), (key, value))
+
+    def remove(self, hex_code):
+        node = self._nodes.pop(hex_code.lower(), None)
+        if node is not None:
+            self._tree.remove(node)
+
+    def nearest(self, hex_code, k=1, exclude_self=False):
+        """
+        Return up to k (value, hex, delta_e) tuples for the indexed colors
+        closest to hex_code, nearest first.
+        """
+        key = hex_code.lower()
+        accept = (lambda item: item[0] != key) if exclude_self else None
+        return [
+            (value, item_hex, delta_e)
+            for delta_e, (item_hex, value) in self._tree.nearest(hex_to_lab(key), k, accept)
+        ]
+
+
+@lru_cache(maxsize=None)
+def get_named_color_index():
+    """Return the shared index of XKCD and CSS4 named colors (built on first use)"""
+    items = [(c.hex, c.name) for c in get_xkcd_catalog().colors]
+    # CSS names only fill colors XKCD has no name for
+    xkcd_hexes = get_xkcd_catalog().by_hex
+    items += [(c.hex, c.name) for c in get_css4_catalog().colors if c.hex not in xkcd_hexes]
+    return NearestColorIndex(items)
+
+
+def nearest_named_color(hex_code):
+    """Return the closest XKCD/CSS4 named color to hex_code as a ColorMatch"""
+    name, match_hex, delta_e = get_named_color_index().nearest(hex_code)[0]
+    return ColorMatch(name, match_hex, delta_e)
+
+
+def color_name_for_hex(hex_code):
+    """XKCD name for hex_code, or the name of the perceptually closest named color"""
+    name = get_xkcd_catalog().name_for_hex(hex_code, default=None)
+    return name if name is not None else nearest_named_color(hex_code).name
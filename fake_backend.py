@@ -0,0 +1,110 @@
+"""
+Deterministic local stand-in for the Gemini backend.
+
+FakeBackend implements LLMBackend without a network or an API key: it
+answers every prompt with canned text derived from the prompt, after a
+configurable time to first token and at a configurable token rate, and can
+be told to fail a share of its calls. The UI, the chat/summary pipeline and
+their busy/cancel/streaming/retry handling can then be exercised, timed and
+load-tested offline. Run the app with `python3 main.py --fake-backend` to
+use it.
+"""
+import random
+import re
+import threading
+import time
+import zlib
+
+from token_estimate import estimate_tokens
+
+# Defaults: seconds before the first token, tokens streamed per second, tokens per response
+LATENCY = 1.0
+TOKENS_PER_SECOND = 60.0
+RESPONSE_TOKENS = 120
+
+_FILLER = (
+    "warm quiet bright soft heavy calm sharp velvet distant humming familiar "
+    "crisp hazy gentle vivid muted electric earthy"
+).split()
+# "name (#rrggbb): description" lines, as prompts list the colors
+_ENTRY_LINE = re.compile(r"\s*[\w'/ -]+ \(#[0-9a-fA-F]{6}\): ")
+
+
+class InjectedFailure(ConnectionError):
+    """Raised by FakeBackend for the calls it was asked to fail"""
+
+
+class FakeBackend:
+    """
+    LLMBackend that answers locally.
+
+    latency: seconds until the first token (for generate(), until the reply)
+    tokens_per_second: streaming rate, also added to generate()'s wait
+    response_tokens: length of each reply, in (approximate) tokens
+    failure_rate: share of calls, 0 to 1, that raise InjectedFailure
+    fail_after_tokens: when set, failing streams break off after this many
+        tokens instead of before the first one
+    seed: makes the failure pattern reproducible
+
+    Replies depend only on the prompt, so they are deterministic; they echo
+    the prompt's color lines, making them plausible enough to lay out.
+    """
+
+    def __init__(self, latency=LATENCY, tokens_per_second=TOKENS_PER_SECOND, response_tokens=RESPONSE_TOKENS,
+                 failure_rate=0.0, fail_after_tokens=None, seed=0, model="fake"):
+        self.model = model
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self.fail_after_tokens = fail_after_tokens
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def has_api_key(self):
+        return True
+
+    def count_tokens(self, prompt):
+        return estimate_tokens(prompt)
+
+    def reply(self, prompt):
+        """The canned reply to prompt"""
+        lines = [line.strip() for line in prompt.splitlines() if _ENTRY_LINE.match(line)]
+        text = "FAKE RESPONSE\n" + "".join(f"   - {line[:60]}\n" for line in lines[:8])
+        words = []
+        rng = random.Random(zlib.crc32(prompt.encode("utf-8")))
+        while estimate_tokens(text + " ".join(words)) < self.response_tokens:
+            words.append(rng.choice(_FILLER))
+        return text + " ".join(words) + "\n"
+
+    def _should_fail(self):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+            return fail
+
+    def generate(self, prompt):
+        fail = self._should_fail()
+        text = self.reply(prompt)
+        time.sleep(self.latency + estimate_tokens(text) / self.tokens_per_second)
+        if fail:
+            raise InjectedFailure("Injected failure (fake backend)")
+        return text
+
+    def stream(self, prompt):
+        fail = self._should_fail()
+        time.sleep(self.latency)
+        if fail and self.fail_after_tokens is None:
+            raise InjectedFailure("Injected failure (fake backend)")
+        # A token is roughly a word and its trailing whitespace
+        for i, token in enumerate(re.findall(r"\S*\s*", self.reply(prompt))):
+            if fail and i >= self.fail_after_tokens:
+                raise InjectedFailure("Injected failure mid-stream (fake backend)")
+            if i:
+                time.sleep(1 / self.tokens_per_second)
+            if token:
+                yield token
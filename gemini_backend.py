@@ -1,167 +1,178 @@
 import os
+import random
+import threading
+import time
 from dotenv import load_dotenv
-from google import genai
 
-load_dotenv()
-api_key = os.environ.get("GOOGLE_GENERATIVE_AI_API_KEY")
+MODEL_NAME = "gemini-2.5-flash"
+API_KEY_VARIABLE = "GOOGLE_GENERATIVE_AI_API_KEY"
+
+# Seconds a request may take (for a streamed response: between chunks)
+REQUEST_TIMEOUT = 120.0
+# Transient failures are retried with exponential backoff and jitter
+MAX_RETRIES = 4
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+# Rate limiting, timeouts and server-side errors are worth retrying; other errors are not
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def is_transient(error):
+    import httpx
+    from google.genai import errors
+    if isinstance(error, errors.APIError):
+        return error.code in TRANSIENT_STATUS_CODES
+    # Timeouts and dropped connections
+    return isinstance(error, httpx.TransportError)
+
+
+def retry_delay(attempt, base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    """Backoff before retry number attempt (0-based): exponential, with the upper half jittered"""
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class GeminiBackend:
+    """
+    LLMBackend for Gemini: one configured connection, shared by every request.
+
+    The API key is read from .env and the environment once, on creation, and
+    again only when reload() is called (APIKeyPopup does so after saving a
+    new key). The genai client, and with it its pool of HTTP connections, is
+    created on first use and reused. Every request has a timeout, and
+    transient failures (rate limiting, server errors, timeouts, dropped
+    connections) are retried with exponential backoff and jitter.
+
+    last_call() reports the retries and token usage of the calling thread's
+    most recent request, for metrics.
+    """
+
+    def __init__(self, model=MODEL_NAME, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retries = 0
+        self._lock = threading.Lock()
+        # Per-thread details of the last request; requests run on several threads at once
+        self._last_call = threading.local()
+        self._client = None
+        self.api_key = None
+        self.reload()
+
+    def reload(self):
+        """Re-read the configuration; the client is recreated on the next request"""
+        load_dotenv(override=True)
+        with self._lock:
+            self.api_key = os.environ.get(API_KEY_VARIABLE) or None
+            # Requests still running on the old client finish normally
+            self._client = None
+
+    def has_api_key(self):
+        return self.api_key is not None
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                if not self.api_key:
+                    raise ValueError("API key is required for this operation")
+                # google.genai takes over half a second to import, so it is loaded on the first request, not at startup
+                from google import genai
+                from google.genai import types
+                self._client = genai.Client(
+                    api_key=self.api_key,
+                    http_options=types.HttpOptions(timeout=int(self.timeout * 1000)),
+                )
+            return self._client
+
+    def last_call(self):
+        """{"retries", "prompt_tokens", "response_tokens"} of this thread's last request (tokens None if unreported)"""
+        return dict(vars(self._last_call))
+
+    def _start_call(self):
+        self._last_call.__dict__.update(retries=0, prompt_tokens=None, response_tokens=None)
+
+    def _record_usage(self, usage):
+        if usage is None:
+            return
+        self._last_call.prompt_tokens = usage.prompt_token_count
+        # Thinking tokens are billed as output too
+        if usage.candidates_token_count is not None or usage.thoughts_token_count is not None:
+            self._last_call.response_tokens = (usage.candidates_token_count or 0) + (usage.thoughts_token_count or 0)
+
+    def _should_retry(self, error, attempt):
+        if attempt >= self.max_retries or not is_transient(error):
+            return False
+        self.retries += 1
+        self._last_call.retries += 1
+        time.sleep(retry_delay(attempt))
+        return True
+
+    def _call(self, request):
+        """Run request(client), retrying transient failures"""
+        self._start_call()
+        attempt = 0
+        while True:
+            try:
+                return request(self.client())
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                attempt += 1
+
+    def generate(self, prompt):
+        """Send one prompt and return the response text"""
+        response = self._call(lambda client: client.models.generate_content(model=self.model, contents=prompt))
+        self._record_usage(response.usage_metadata)
+        return response.text
+
+    def count_tokens(self, prompt):
+        response = self._call(lambda client: client.models.count_tokens(model=self.model, contents=prompt))
+        return response.total_tokens
+
+    def stream(self, prompt):
+        """
+        Send one prompt, yielding the response text in chunks as they arrive.
+
+        Only failures before the first chunk are retried: once text has been
+        yielded, starting over would repeat it.
+        """
+        self._start_call()
+        attempt = 0
+        while True:
+            started = False
+            try:
+                chunks = self.client().models.generate_content_stream(model=self.model, contents=prompt)
+                for chunk in chunks:
+                    # The usage report arrives with the last chunk
+                    self._record_usage(chunk.usage_metadata)
+                    # Chunks carrying only metadata (e.g. the final usage report) have no text
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+                return
+            except Exception as e:
+                if started or not self._should_retry(e, attempt):
+                    raise
+                attempt += 1
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the shared Gemini backend (created, reading the configuration, on first use)"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = GeminiBackend()
+        return _backend
 
-# Don't raise error immediately, just store the API key status
-def has_api_key():
-    # Reload environment variables to check for newly saved API keys
-    load_dotenv(override=True)
-    current_api_key = os.environ.get("GOOGLE_GENERATIVE_AI_API_KEY")
-    return bool(current_api_key)
 
-# Only create client if API key is available
-client = None
-if api_key:
-    client = genai.Client(api_key=api_key)
+def has_api_key():
+    return get_backend().has_api_key()
 
-SUMMARY_PATH = "db/summary.txt"
-MODEL_NAME = "gemini-2.5-flash"
 
-def generate_summary_text(data):
-    if not has_api_key():
-        raise ValueError("API key is required for this operation")
-    
-    # Reload client if API key was added after startup
-    global client
-    if not client:
-        current_api_key = os.environ.get("GOOGLE_GENERATIVE_AI_API_KEY")
-        if current_api_key:
-            client = genai.Client(api_key=current_api_key)
-        else:
-            raise ValueError("API key is required for this operation")
-    
-    prompt = (
-        """You are an expert at concisely summarizing color associations based on their color categories.
-
-Given a list of colors and their associated synesthetic descriptions, summarize the data by:
-1. Grouping colors into primary, secondary, and tertiary color categories arranged in rainbow order.
-2. Subcategorizing and summarizing each group by HUE (NO MORE THAN 4).  ("Light purples" ✅, "murky yellows" ✅, "earthy greens" ✅)
-
-Whenever you mention a specific color, ALWAYS include the hex code afterward, like "dark maroon (#3c0008)".
-Consider combinations of primary and secondary colors (like blue-greens, blue-purples, and purple-reds) separately from primary and secondary colors, and focus on how they combine aspects of the colors mixed. Place them between the colors that make them up, following rainbow order.
-
-Format the output like this:
-- Use indentation and dashes for subcategorization
-- Categorize the HUES ONLY, not the associations connected to them (e.g. "bright", "dark", "earthy", "muted" shades) and examples
-- Use hanging bullet point format with a bullet for each complete thought
-- No more than 64 characters per line!
-- Avoid markdown formatting.
-- Keep it visually clear and intuitive, using the following format:
-
-WARM COLORS
------------------------------------------------------------------------
-Pinks: [One-sentence summary]
-   - Light Pinks: [Three-word summary]
-       - Baby pink (#ffb7ce): [Three-word summary of association]
-   - Bright Pinks: [Three-word summary]
-       - Hot pink (#ff028d): [Three-word summary of association]
-       - Barbie pink (#fe46a5): [Three-word summary of association]
-   - Muted Pinks: [Three-word summary]
-       - Greyish pink (#c88d94): [Three-word summary of association]
-
-Reds: [One-sentence summary]
-   - Bright Reds: [Three-word summary]
-       - Lightish red (#fe2f4a): [Three-word summary of association]
-       - Watermelon (#fd4659): [Three-word summary of association]
-   - Muted Reds: [Three-word summary]
-       - Pastel red (#db5856): [Three-word summary of association]
-       - Raspberry (#b00149): [Three-word summary of association]
-   - Dark Reds: [Three-word summary]
-       - Dark maroon (#3c0008): [Three-word summary of association]
-       - Dried blood (#4b0101): [Three-word summary of association]
-
-Oranges: 
-[...]
-
-Yellow-Oranges:
-[...]
-
-Yellows:
-[...]
-
-Yellow-Greens:
-
-\n\n\n   
-COOL COLORS
------------------------------------------------------------------------
-...\n\n\n
-NEUTRAL COLORS  
------------------------------------------------------------------------
-...
-\n\n\n
-=======================================================================
-DARK VS LIGHT:
-[Indented paragraph about dark colors in general. Do not use line breaks]
-\n
-[Indented paragraph about light colors in general. Do not use line breaks]
-\n\n\n
-=======================================================================
-DULL VS VIBRANT:
-[Indented paragraph about dull colors in general. Do not use line breaks]
-\n
-[Indented paragraph about vibrant colors in general. Do not use line breaks]
-\n\n\n
-=======================================================================
-OVERALL SUMMARY:
-[3-paragraph indented summary with newlines between each paragraph.]
-
-Be concise but insightful. Focus on deeper patterns not explored or obvious from the rest of the analysis.
-"""
-        + "\n".join(
-            f"{e['xkcd_name']} ({e['hex']}): {e['associations']}" for e in data
-        )
-    )
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=prompt
-    )
-    return response.text
-
-def update_summary_file(data):
-    summary = generate_summary_text(data)
-    with open(SUMMARY_PATH, "w", encoding="utf-8") as f:
-        f.write(summary)
-    return summary
-
-def generate_chat_response(prompt, data):
-    if not has_api_key():
-        raise ValueError("API key is required for this operation")
-    
-    # Reload client if API key was added after startup
-    global client
-    if not client:
-        current_api_key = os.environ.get("GOOGLE_GENERATIVE_AI_API_KEY")
-        if current_api_key:
-            client = genai.Client(api_key=current_api_key)
-        else:
-            raise ValueError("API key is required for this operation")
-    
-    db_text = "\n".join(
-        f"{e['xkcd_name']} ({e['hex']}): {e['associations']}" for e in data
-    )
-    full_prompt = (
-        "You are a thoughtful assistant trained on the following database of "
-        "synesthetic color associations:\n\n"
-        f"{db_text}\n\n"
-        "Your job is to respond to the user's prompt using clear and intuitive "
-        "plaintext formatting that fits well in a window ~64 characters wide.\n\n"
-        "FORMATTING GUIDELINES:\n"
-        "- Use ALL-CAPS for major headers\n"
-        "- Use hanging indents: when a line wraps, indent it with 6 spaces so it's aligned with "
-        "the text after the bullet or number, NOT under the bullet/number itself\n"
-        "- Use dashes ( - ) for lists and bullet points\n"
-        "- Use paragraphs for explanations and grouped analysis\n"
-        "- Avoid any markdown formatting (no asterisks, hashes, underscores, etc.)\n"
-        "- Use hex codes when referencing colors\n"
-        "- Keep line length around 70 characters for readability\n"
-        "- Use consistent spacing and line breaks\n\n"
-        f"Prompt: {prompt}"
-    )
-    response = client.models.generate_content(
-        model=MODEL_NAME,
-        contents=full_prompt
-    )
-    return response.text 
\ No newline at end of file
+def reload_config():
+    """Pick up a changed API key (e.g. one just saved to .env)"""
+    get_backend().reload()
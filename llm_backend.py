@@ -0,0 +1,32 @@
+"""
+The interface the app needs from a language model.
+
+The Summarize and Chat tabs, and the chat/summary pipeline in assistant.py,
+only use these methods, so any object providing them can stand in for
+Gemini: gemini_backend.GeminiBackend talks to the real model, and
+fake_backend.FakeBackend answers locally for tests and offline runs.
+
+A backend may also provide last_call(), returning a dict with the
+"retries", "prompt_tokens" and "response_tokens" of the calling thread's
+most recent request; metrics.py records those when present and otherwise
+estimates the tokens.
+"""
+from typing import Iterator, Protocol, runtime_checkable
+
+
+@runtime_checkable
+class LLMBackend(Protocol):
+    # Model identifier; part of every cache key, so backends never share cached responses
+    model: str
+
+    def has_api_key(self) -> bool:
+        """Whether the backend is configured well enough to make requests"""
+
+    def generate(self, prompt: str) -> str:
+        """Send one prompt and return the complete response text"""
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Send one prompt, yielding the response text in chunks as they arrive"""
+
+    def count_tokens(self, prompt: str) -> int:
+        """Number of tokens prompt takes up for this model"""
@@ -1,8 +1,16 @@
+import time
+
+# Taken before the app's imports so --startup-time can report their cost
+_IMPORT_START = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
 import webbrowser
 import os
+import sys
+from typing import Optional
 
+from llm_backend import LLMBackend
 from ui_modules.train import TrainTab
 from ui_modules.summarize import SummarizeTab
 from ui_modules.chat import ChatTab
@@ -10,12 +18,16 @@ from ui_modules.colors import ColorsTab
 from ui_modules.associations import AssociationsTab
 from ui_modules.popups.help_popup import HelpPopup
 from ui_modules.popups.about_popup import AboutPopup
-from utils import set_database_update_callback, get_link_colors
+from utils import get_link_colors, close_database, warm_search_index, warm_association_color_index
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
 
 class SynesthesiaApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, backend: Optional[LLMBackend] = None):
         super().__init__()
+        # LLM backend for the Summarize and Chat tabs (None means Gemini)
+        self.backend = backend
         self.title("MindPalette")
         self.geometry("800x600")
         
@@ -57,6 +69,9 @@ class SynesthesiaApp(tk.Tk):
         # Initialize tab modules after notebook is set up
         self.initialize_tab_modules()
 
+        # Write any pending database changes before the window closes
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
     # ---------- Footer ----------
     def create_footer_links(self, parent):
         from tkinter import ttk
@@ -119,12 +134,14 @@ class SynesthesiaApp(tk.Tk):
 
     def initialize_tab_modules(self):
         self.train_module = TrainTab(self.train_tab)
-        self.summarize_module = SummarizeTab(self.summarize_tab, self.refresh_all_tabs)
-        self.chat_module = ChatTab(self.chat_tab, self.refresh_all_tabs)
+        self.summarize_module = SummarizeTab(self.summarize_tab, self.refresh_all_tabs, backend=self.backend)
+        self.chat_module = ChatTab(self.chat_tab, self.refresh_all_tabs, backend=self.backend)
         self.colors_module = ColorsTab(self.view_colors_tab)
         self.associations_module = AssociationsTab(self.associations_tab, self.refresh_associations)
-        set_database_update_callback(self.refresh_associations)
         self.refresh_associations()
+        # Index the associations for search in the background rather than on the first keystroke
+        warm_search_index()
+        warm_association_color_index()
 
     def refresh_all_tabs(self):
         self.summarize_module.setup_ui()
@@ -134,6 +151,17 @@ class SynesthesiaApp(tk.Tk):
         if hasattr(self, 'associations_module'):
             self.associations_module.refresh_table()
 
+    def on_close(self):
+        if "--metrics" in sys.argv:
+            from metrics import format_stats, get_metrics
+            print(format_stats(get_metrics().stats()))
+        try:
+            close_database()
+        except Exception as e:
+            messagebox.showerror("Error", f"Unsaved changes could not be written: {str(e)}")
+        finally:
+            self.destroy()
+
     def center_window(self):
         self.update_idletasks()
         width = 800
@@ -143,6 +171,32 @@ class SynesthesiaApp(tk.Tk):
         self.geometry(f"{width}x{height}+{x}+{y}")
 
 
+def report_startup_time(app, window_start):
+    """Print import and first-frame timings, then close the app (for --startup-time)"""
+    app.update()
+    window_seconds = time.perf_counter() - window_start
+    heavy_modules = [name for name in ("matplotlib", "numpy", "google.genai") if name in sys.modules]
+    print(f"Imports:       {_IMPORT_SECONDS * 1000:8.1f} ms")
+    print(f"Window ready:  {window_seconds * 1000:8.1f} ms")
+    print(f"Total startup: {(_IMPORT_SECONDS + window_seconds) * 1000:8.1f} ms")
+    print(f"Heavy modules loaded: {', '.join(heavy_modules) or 'none'}")
+    app.on_close()
+
+
 if __name__ == "__main__":
-    app = SynesthesiaApp()
+    backend = None
+    if "--fake-backend" in sys.argv:
+        # Canned, slow responses for trying the AI tabs offline
+        from fake_backend import FakeBackend
+        backend = FakeBackend()
+        if not isinstance(backend, LLMBackend):
+            sys.exit(f"{type(backend).__name__} does not implement LLMBackend")
+    if "--metrics" in sys.argv:
+        # Log every model call to db/llm_metrics.jsonl, and print this session's stats on exit
+        from metrics import get_metrics
+        get_metrics().enable_file()
+    window_start = time.perf_counter()
+    app = SynesthesiaApp(backend=backend)
+    if "--startup-time" in sys.argv:
+        app.after_idle(report_startup_time, app, window_start)
     app.mainloop()
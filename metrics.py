@@ -0,0 +1,273 @@
+"""
+Token and latency accounting for model calls.
+
+Every call the chat/summary pipeline makes (see assistant.py) is recorded
+with its operation, prompt size, response size, time to first chunk, total
+time, retries and whether it was answered from the response cache. The last
+RING_SIZE records are kept in memory; when a metrics file is enabled (the
+app's --metrics flag) every record is also appended to it as one JSON line.
+
+Print per-operation p50/p95 latency and token spend from the metrics file:
+
+    python3 metrics.py [path]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from token_estimate import estimate_tokens
+
+METRICS_PATH = "db/llm_metrics.jsonl"
+# Records kept in memory
+RING_SIZE = 1000
+
+
+def percentile(values, q):
+    """q-th percentile (0-100) of values, interpolating between ranks; None if empty"""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_valid_record(record):
+    """Whether record has the fields summarize_records() needs, with usable types"""
+    return (isinstance(record, dict)
+            and isinstance(record.get("operation"), str)
+            and isinstance(record.get("cached"), bool)
+            and isinstance(record.get("status"), str)
+            and all(_is_number(record.get(key)) for key in ("latency", "retries", "prompt_tokens", "response_tokens"))
+            and (record.get("ttfb") is None or _is_number(record["ttfb"])))
+
+
+def summarize_records(records):
+    """
+    {operation: stats} for a list of records; malformed records are skipped.
+
+    Latency and time-to-first-chunk percentiles cover model calls only;
+    cache hits are counted separately, as they spend no tokens and take
+    milliseconds.
+    """
+    operations = {}
+    for record in records:
+        if is_valid_record(record):
+            operations.setdefault(record["operation"], []).append(record)
+
+    stats = {}
+    for operation, calls in sorted(operations.items()):
+        model_calls = [r for r in calls if not r["cached"]]
+        latencies = [r["latency"] for r in model_calls if r["status"] == "ok"]
+        first_chunks = [r["ttfb"] for r in model_calls if r["ttfb"] is not None]
+        stats[operation] = {
+            "calls": len(calls),
+            "cache_hits": len(calls) - len(model_calls),
+            "errors": sum(r["status"] == "error" for r in calls),
+            "cancelled": sum(r["status"] == "cancelled" for r in calls),
+            "retries": sum(r["retries"] for r in calls),
+            "p50_latency": percentile(latencies, 50),
+            "p95_latency": percentile(latencies, 95),
+            "p50_ttfb": percentile(first_chunks, 50),
+            "p95_ttfb": percentile(first_chunks, 95),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in calls),
+            "response_tokens": sum(r["response_tokens"] for r in calls),
+        }
+    return stats
+
+
+def format_stats(stats):
+    """The output of summarize_records as a plain-text table"""
+    def seconds(value):
+        return "-" if value is None else f"{value:.2f}s"
+
+    header = (f"{'operation':<16}{'calls':>6}{'cached':>7}{'errors':>7}{'retries':>8}"
+              f"{'p50':>8}{'p95':>8}{'ttfb p50':>9}{'ttfb p95':>9}{'prompt tok':>11}{'resp tok':>10}")
+    lines = [header, "-" * len(header)]
+    for operation, s in stats.items():
+        lines.append(
+            f"{operation:<16}{s['calls']:>6}{s['cache_hits']:>7}{s['errors']:>7}{s['retries']:>8}"
+            f"{seconds(s['p50_latency']):>8}{seconds(s['p95_latency']):>8}"
+            f"{seconds(s['p50_ttfb']):>9}{seconds(s['p95_ttfb']):>9}"
+            f"{s['prompt_tokens']:>11}{s['response_tokens']:>10}"
+        )
+    if not stats:
+        lines.append("(no calls recorded)")
+    return "\n".join(lines)
+
+
+def load_records(path=METRICS_PATH):
+    """Records from a metrics file; lines that don't parse are skipped"""
+    records = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+class MeteredCall:
+    """
+    Measures one model call; used as a context manager around it.
+
+    chunk(text) is called for each piece of the response as it arrives (once,
+    with the whole text, for a non-streamed call). The record is written on
+    exit: "ok", "error" if the call raised, or "cancelled" if a stream was
+    closed before it finished.
+    """
+
+    def __init__(self, metrics, backend, operation, prompt):
+        self.metrics = metrics
+        self.backend = backend
+        self.operation = operation
+        self.prompt = prompt
+        self.response_parts = []
+        self.ttfb = None
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def chunk(self, text):
+        if self.ttfb is None:
+            self.ttfb = time.perf_counter() - self.started
+        self.response_parts.append(text)
+
+    def __exit__(self, exc_type, exc, tb):
+        latency = time.perf_counter() - self.started
+        if exc_type is None:
+            status = "ok"
+        elif issubclass(exc_type, GeneratorExit):
+            status = "cancelled"
+        else:
+            status = "error"
+        response = "".join(self.response_parts)
+        # Backends that report exact usage and retries (GeminiBackend) expose
+        # them per thread through last_call(); otherwise tokens are estimated
+        last_call = getattr(self.backend, "last_call", None)
+        usage = last_call() if last_call is not None else {}
+        self.metrics.record(
+            operation=self.operation,
+            model=self.backend.model,
+            prompt_chars=len(self.prompt),
+            prompt_tokens=usage.get("prompt_tokens") or estimate_tokens(self.prompt),
+            response_chars=len(response),
+            response_tokens=usage.get("response_tokens") or estimate_tokens(response),
+            ttfb=self.ttfb,
+            latency=latency,
+            retries=usage.get("retries", 0),
+            cached=False,
+            status=status,
+            error=None if exc is None or status != "error" else f"{exc_type.__name__}: {exc}",
+        )
+        return False
+
+
+class Metrics:
+    """
+    Ring buffer of call records, optionally mirrored to a JSONL file.
+
+    Each record is a dict with: time, operation, model, prompt_chars,
+    prompt_tokens, response_chars, response_tokens, ttfb (seconds to the
+    first chunk, None if none arrived), latency (seconds), retries, cached,
+    status ("ok", "error" or "cancelled") and error. Safe to use from
+    several threads.
+    """
+
+    def __init__(self, size=RING_SIZE, path=None):
+        self._records = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.path = path
+
+    def enable_file(self, path=METRICS_PATH):
+        """Also append every record to path (None turns the file off)"""
+        with self._lock:
+            self.path = path
+
+    def record(self, **fields):
+        record = {"time": round(time.time(), 3)}
+        record.update(fields)
+        for key in ("ttfb", "latency"):
+            if record.get(key) is not None:
+                record[key] = round(record[key], 4)
+        with self._lock:
+            self._records.append(record)
+            if self.path:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+    def call(self, backend, operation, prompt):
+        return MeteredCall(self, backend, operation, prompt)
+
+    def record_cache_hit(self, backend, operation, response, latency):
+        """A request answered from the response cache: no prompt was sent and no tokens spent"""
+        return self.record(
+            operation=operation, model=backend.model,
+            prompt_chars=0, prompt_tokens=0,
+            response_chars=len(response), response_tokens=0,
+            ttfb=latency, latency=latency, retries=0,
+            cached=True, status="ok", error=None,
+        )
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def stats(self):
+        return summarize_records(self.records())
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the shared metrics recorder (in-memory only until enable_file() is called)"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
+
+
+def metered_generate(backend, operation, prompt):
+    """backend.generate(prompt), recorded under operation"""
+    with get_metrics().call(backend, operation, prompt) as call:
+        text = backend.generate(prompt)
+        call.chunk(text)
+    return text
+
+
+def metered_stream(backend, operation, prompt):
+    """backend.stream(prompt), recorded under operation once it ends, fails or is closed"""
+    with get_metrics().call(backend, operation, prompt) as call:
+        for chunk in backend.stream(prompt):
+            call.chunk(chunk)
+            yield chunk
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else METRICS_PATH
+    print(format_stats(summarize_records(load_records(path))))
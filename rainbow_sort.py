@@ -0,0 +1,300 @@
+import bisect
+
+from utils import (
+    GREY_THRESHOLD,
+    PALE_THRESHOLD,
+    RAINBOW_BAND_CENTERS,
+    get_color_sort_key,
+    srgb_to_linear,
+)
+
+# Below this size the per-color Python keys are cheaper than setting up arrays
+# (and a short list never pays for importing NumPy)
+VECTORIZE_MIN_SIZE = 256
+
+_numpy = None
+_tables = None
+
+
+def load_numpy():
+    """Return the numpy module, or None when it is not installed"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+def _lookup_tables(np):
+    """(hex digit value per ASCII byte, linear sRGB per 8-bit channel value)"""
+    global _tables
+    if _tables is None:
+        digits = np.full(256, 255, dtype=np.uint8)  # 255 marks a non-hex byte
+        for value, char in enumerate("0123456789abcdef"):
+            digits[ord(char)] = value
+            digits[ord(char.upper())] = value
+        # Same expression as relative_luminance(), so luminances match bit for bit
+        linear = np.array([srgb_to_linear(i / 255.0) for i in range(256)], dtype=np.float64)
+        _tables = (digits, linear)
+    return _tables
+
+
+def parse_hexes(np, hex_codes):
+    """
+    Pack hex codes into a uint32 array of 0xRRGGBB values.
+
+    Returns None when any code is not a plain 6-digit hex string, so the caller
+    can fall back to the per-color path (which parses, or rejects, it exactly
+    as hex_to_hsv() does).
+    """
+    joined = "".join(hex_codes)
+    if joined.isascii() and len(joined) == 7 * len(hex_codes) and max(map(len, hex_codes), default=7) == 7:
+        # Fast path: every code is "#rrggbb", so the joined string is a fixed-width table
+        table = np.frombuffer(joined.encode("ascii"), dtype=np.uint8).reshape(-1, 7)
+        if not (table[:, 0] == ord("#")).all():
+            return None
+        raw = table[:, 1:]
+    else:
+        try:
+            raw = np.array([h.lstrip("#") for h in hex_codes], dtype="S6")
+        except UnicodeEncodeError:
+            return None
+        raw = raw.view(np.uint8).reshape(-1, 6)
+
+    digits, _ = _lookup_tables(np)
+    values = digits[raw]
+    if (values == 255).any():
+        return None
+    values = values.astype(np.uint32)
+    return (
+        (values[:, 0] << 20) | (values[:, 1] << 16) | (values[:, 2] << 12)
+        | (values[:, 3] << 8) | (values[:, 4] << 4) | values[:, 5]
+    )
+
+
+def _nearest_band(np, hue):
+    """Index of the nearest band center per hue; ties go to the first center, like list.index(min(...))"""
+    best_band = np.zeros(hue.shape, dtype=np.int8)
+    best_distance = None
+    for band, center in enumerate(RAINBOW_BAND_CENTERS):
+        # For hue in [0, 360), min(|d|, |d + 360|, |d - 360|) is exactly min(|d|, 360 - |d|)
+        distance = np.abs(hue - center)
+        np.minimum(distance, 360 - distance, out=distance)
+        if best_distance is None:
+            best_distance = distance
+            continue
+        closer = distance < best_distance
+        best_band[closer] = band
+        np.minimum(best_distance, distance, out=best_distance)
+    return best_band
+
+
+def rainbow_sort_keys(np, packed, snap_pale=False):
+    """
+    Vectorized get_color_sort_key() for packed 0xRRGGBB colors.
+
+    Returns (is_grey, band_index, luminance_key, hue) arrays. Every step uses
+    the same float operations, in the same order, as colorsys.rgb_to_hsv() and
+    the per-color key, so the keys are identical, not just close.
+    """
+    _, linear = _lookup_tables(np)
+    r_byte = (packed >> 16) & 0xFF
+    g_byte = (packed >> 8) & 0xFF
+    b_byte = packed & 0xFF
+
+    # Linearized-sRGB relative luminance (ITU-R BT.709)
+    lum = 0.2126 * linear[r_byte] + 0.7152 * linear[g_byte] + 0.0722 * linear[b_byte]
+
+    # HSV, following colorsys.rgb_to_hsv()
+    r = r_byte / 255.0
+    g = g_byte / 255.0
+    b = b_byte / 255.0
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    rangec = maxc - minc
+    achromatic = rangec == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sat = np.where(achromatic, 0.0, rangec / maxc)
+        rc = (maxc - r) / rangec
+        gc = (maxc - g) / rangec
+        bc = (maxc - b) / rangec
+    hue = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    hue = np.where(achromatic, 0.0, (hue / 6.0) % 1.0) * 360.0
+
+    is_grey = sat < GREY_THRESHOLD
+
+    if snap_pale:
+        pale = ~is_grey & (sat < PALE_THRESHOLD)
+        if pale.any():
+            pale_hue = hue[pale]
+            centers = np.array(RAINBOW_BAND_CENTERS, dtype=np.float64)
+            hue_diff = centers[_nearest_band(np, pale_hue)] - pale_hue
+            hue_diff = np.where(hue_diff > 180, hue_diff - 360, np.where(hue_diff < -180, hue_diff + 360, hue_diff))
+            hue = hue.copy()
+            hue[pale] = (pale_hue + 0.2 * hue_diff) % 360
+
+    band = np.where(is_grey, 0, _nearest_band(np, hue)).astype(np.int8)
+    # Alternating lightness direction: light→dark for even bands, dark→light for odd ones
+    luminance_key = np.where(~is_grey & (band % 2 == 1), -lum, lum)
+    return is_grey.astype(np.int8), band, luminance_key, hue
+
+
+def _dense_rank(np, values):
+    """Rank of each value among the distinct values (equal values share a rank)"""
+    order = np.argsort(values)
+    ordered = values[order]
+    steps = np.empty(len(values), dtype=np.int64)
+    steps[0] = 0
+    np.not_equal(ordered[1:], ordered[:-1], out=steps[1:])
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[order] = np.cumsum(steps)
+    return ranks
+
+
+def _lexsort_keys(np, is_grey, band, luminance_key, hue):
+    """
+    Stable argsort by (is_grey, band, luminance_key, hue).
+
+    np.lexsort does this with one stable sort per key, and stable float sorts
+    are several times slower than NumPy's default sort. Instead, the float keys
+    are replaced by their ranks and packed with the band into a single int64,
+    which is sorted once; a stable sort is only needed when packed keys tie.
+    """
+    n = len(hue)
+    bits = max(n.bit_length(), 1)
+    if 4 + 2 * bits > 63:
+        # lexsort's last key is the primary one
+        return np.lexsort((hue, luminance_key, band, is_grey))
+
+    # Greys always have band 0, so (is_grey, band) collapses into one 4-bit family
+    family = np.where(is_grey, len(RAINBOW_BAND_CENTERS), band).astype(np.int64)
+    packed = (family << (2 * bits)) | (_dense_rank(np, luminance_key) << bits) | _dense_rank(np, hue)
+    order = np.argsort(packed)
+    ordered = packed[order]
+    if n > 1 and (ordered[1:] == ordered[:-1]).any():
+        order = np.argsort(packed, kind="stable")
+    return order
+
+
+def _vectorized_keys(hex_codes, snap_pale):
+    """(numpy, key arrays) for hex_codes, or None when the per-color path should be used"""
+    if len(hex_codes) < VECTORIZE_MIN_SIZE:
+        return None
+    np = load_numpy()
+    if np is None:
+        return None
+    packed = parse_hexes(np, hex_codes)
+    if packed is None:
+        return None
+    return np, rainbow_sort_keys(np, packed, snap_pale)
+
+
+def rainbow_argsort(hex_codes, snap_pale=False):
+    """
+    Return the indexes of hex_codes in rainbow order.
+
+    The order is exactly that of sorted(..., key=get_color_sort_key), ties
+    included (both sorts are stable). Large lists are sorted with NumPy when it
+    is available; otherwise, and for short lists, the per-color keys are used.
+    """
+    hex_codes = list(hex_codes)
+    vectorized = _vectorized_keys(hex_codes, snap_pale)
+    if vectorized is not None:
+        np, keys = vectorized
+        return _lexsort_keys(np, *keys).tolist()
+    keys = [get_color_sort_key(h, snap_pale=snap_pale) for h in hex_codes]
+    return sorted(range(len(hex_codes)), key=keys.__getitem__)
+
+
+def rainbow_argsort_with_keys(hex_codes, snap_pale=False):
+    """
+    Like rainbow_argsort(), but also return each code's get_color_sort_key()
+    tuple; building the tuples costs more than the sort itself, so this is
+    only for callers that keep them (RainbowSortedList)
+    """
+    hex_codes = list(hex_codes)
+    vectorized = _vectorized_keys(hex_codes, snap_pale)
+    if vectorized is not None:
+        np, (is_grey, band, luminance_key, hue) = vectorized
+        order = _lexsort_keys(np, is_grey, band, luminance_key, hue).tolist()
+        keys = list(zip(is_grey.tolist(), band.tolist(), luminance_key.tolist(), hue.tolist()))
+        return order, keys
+
+    keys = [get_color_sort_key(h, snap_pale=snap_pale) for h in hex_codes]
+    return sorted(range(len(hex_codes)), key=keys.__getitem__), keys
+
+
+class RainbowSortedList:
+    """
+    Color entries kept in rainbow order as they change.
+
+    The entries are sorted once on construction; after that add() and remove()
+    find the entry's position by bisection instead of re-sorting the whole
+    list. Entries are identified by hex code (case-insensitively), and since a
+    sort key depends only on the hex, replacing an entry never moves it.
+    Entries with equal sort keys stay in the order they were added, as with a
+    stable sort.
+    """
+
+    def __init__(self, entries=(), snap_pale=False):
+        entries = list(entries)
+        self.snap_pale = snap_pale
+        order, keys = rainbow_argsort_with_keys([e["hex"] for e in entries], snap_pale)
+        # Positions are ordered by (sort key, sequence number)
+        self._positions = [(keys[i], i) for i in order]
+        self._entries = [entries[i] for i in order]
+        self._position_by_hex = {
+            entry["hex"].lower(): position for entry, position in zip(self._entries, self._positions)
+        }
+        self._next_sequence = len(entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __contains__(self, hex_code):
+        return hex_code.lower() in self._position_by_hex
+
+    def __getitem__(self, i):
+        return self._entries[i]
+
+    def entries(self):
+        """Return a copy of the entries, in rainbow order"""
+        return list(self._entries)
+
+    def index(self, hex_code):
+        """Position of the entry with hex_code in rainbow order, or None if there is none"""
+        position = self._position_by_hex.get(hex_code.lower())
+        if position is None:
+            return None
+        return bisect.bisect_left(self._positions, position)
+
+    def add(self, entry):
+        """Insert entry, or replace the entry with the same hex in place"""
+        hex_code = entry["hex"].lower()
+        position = self._position_by_hex.get(hex_code)
+        if position is not None:
+            self._entries[bisect.bisect_left(self._positions, position)] = entry
+            return
+
+        position = (get_color_sort_key(entry["hex"], snap_pale=self.snap_pale), self._next_sequence)
+        self._next_sequence += 1
+        i = bisect.bisect_left(self._positions, position)
+        self._positions.insert(i, position)
+        self._entries.insert(i, entry)
+        self._position_by_hex[hex_code] = position
+
+    def remove(self, hex_code):
+        """Remove the entry with hex_code; returns False if there was none"""
+        position = self._position_by_hex.pop(hex_code.lower(), None)
+        if position is None:
+            return False
+        i = bisect.bisect_left(self._positions, position)
+        del self._positions[i]
+        del self._entries[i]
+        return True
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = "db/llm_cache.db"
+
+# Eviction limits: total size of the cached responses, and age since last use
+MAX_CACHE_BYTES = 16 * 1024 * 1024
+MAX_CACHE_AGE = 30 * 24 * 60 * 60
+
+
+def normalize_prompt(prompt):
+    """Case- and whitespace-insensitive form of a prompt, so trivially different questions share an entry"""
+    return " ".join(prompt.split()).casefold()
+
+
+def fingerprint_data(data):
+    """
+    Content hash of a list of association entries.
+
+    Independent of entry order, so it only changes when an entry is added,
+    removed or edited.
+    """
+    rows = sorted((e["hex"].lower(), e.get("xkcd_name", ""), e.get("associations", "")) for e in data)
+    return hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def cache_key(model, operation, prompt, data_fingerprint):
+    parts = (model, operation, normalize_prompt(prompt), data_fingerprint)
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of LLM responses, in a small SQLite database.
+
+    Responses are keyed by model, operation ("chat", "summary"...), the
+    normalized prompt and a fingerprint of the association data they were
+    generated from, so editing the database naturally stops old answers from
+    being served. Entries unused for longer than max_age are dropped, and
+    once the cached text exceeds max_bytes the least recently used entries
+    are evicted. Safe to use from several threads.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_CACHE_BYTES, max_age=MAX_CACHE_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._conn = None
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    " key TEXT PRIMARY KEY,"
+                    " model TEXT NOT NULL,"
+                    " operation TEXT NOT NULL,"
+                    " response TEXT NOT NULL,"
+                    " size INTEGER NOT NULL,"
+                    " created REAL NOT NULL,"
+                    " last_used REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, model, operation, prompt, data_fingerprint):
+        """Return the cached response, or None"""
+        key = cache_key(model, operation, prompt, data_fingerprint)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT response, last_used FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            with conn:
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, model, operation, prompt, data_fingerprint, response):
+        key = cache_key(model, operation, prompt, data_fingerprint)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, operation, response, size, created, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, model, operation, response, len(response.encode("utf-8")), now, now),
+                )
+            self.stores += 1
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits max_bytes"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                evicted = conn.execute(
+                    "DELETE FROM responses WHERE last_used < ?", (time.time() - self.max_age,)
+                ).rowcount
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    stale = []
+                    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                        if total <= self.max_bytes:
+                            break
+                        stale.append((key,))
+                        total -= size
+                    conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+                    evicted += len(stale)
+            self.evictions += evicted
+            return evicted
+
+    def invalidate(self, operation=None, model=None):
+        """
+        Forget cached responses: all of them, or only those for an operation
+        and/or model. Returns the number removed.
+        """
+        clauses = []
+        params = []
+        for column, value in (("operation", operation), ("model", model)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                return conn.execute("DELETE FROM responses" + where, params).rowcount
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+_cache = None
+
+
+def get_response_cache():
+    """Return the shared response cache (opened on first use)"""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
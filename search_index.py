@@ -0,0 +1,262 @@
+import bisect
+import heapq
+import itertools
+import math
+import re
+from collections import Counter, defaultdict
+
+# Hex codes keep their leading "#"; everything else splits on non-word characters
+_TOKEN_RE = re.compile(r"#?\w+")
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+# Score multipliers
+NAME_BOOST = 2.0
+PREFIX_WEIGHT = 0.8
+
+# Terms shorter than this are expanded only to their most common completions,
+# stopping once those cover SHORT_PREFIX_POSTINGS entries in all
+MIN_PREFIX_LENGTH = 3
+SHORT_PREFIX_POSTINGS = 5000
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class AssociationIndex:
+    """
+    Token-level inverted index over association entries.
+
+    Each entry is indexed under the tokens of its name, hex code (with and
+    without the "#") and description. Queries support:
+
+    - multiple terms, all of which must match (AND)
+    - prefix matching on every term ("turq" finds "turquoise"); one- and
+      two-letter terms only expand to their most common completions
+    - "quoted phrases", whose words must appear consecutively
+
+    Results are ranked with BM25, with matches in the color name boosted.
+    The index is built once and kept current with add()/remove().
+    """
+
+    def __init__(self, entries=()):
+        self.docs = {}
+        self._doc_tokens = {}
+        self._name_tokens = {}
+        self._postings = defaultdict(dict)  # token -> {key: term frequency}
+        self._vocabulary = []  # sorted tokens, for prefix lookups
+        self._total_length = 0
+        # Bulk build: sort the vocabulary once instead of inserting token by token
+        for entry in entries:
+            self._index(entry, insort_vocabulary=False)
+        self._vocabulary = sorted(self._postings)
+        # Bounded expansions of one- and two-letter prefixes, until the vocabulary changes
+        self._short_expansions = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    # ---------- Maintenance ----------
+
+    def add(self, entry):
+        """Index entry, replacing any previous version with the same hex"""
+        self._index(entry, insort_vocabulary=True)
+
+    def _index(self, entry, insort_vocabulary):
+        key = entry["hex"].lower()
+        if key in self.docs:
+            self.remove(key)
+
+        hex_token = key if key.startswith("#") else "#" + key
+        name_tokens = tokenize(entry.get("xkcd_name", ""))
+        tokens = name_tokens + [hex_token, hex_token.lstrip("#")] + tokenize(entry.get("associations", ""))
+
+        self.docs[key] = entry
+        self._doc_tokens[key] = tokens
+        self._name_tokens[key] = set(name_tokens)
+        self._total_length += len(tokens)
+
+        for token, count in Counter(tokens).items():
+            postings = self._postings[token]
+            if not postings and insort_vocabulary:
+                bisect.insort(self._vocabulary, token)
+                self._short_expansions.clear()
+            postings[key] = count
+
+    def remove(self, hex_code):
+        key = hex_code.lower()
+        if key not in self.docs:
+            return
+        tokens = self._doc_tokens.pop(key)
+        del self.docs[key]
+        del self._name_tokens[key]
+        self._total_length -= len(tokens)
+
+        for token in set(tokens):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[token]
+                i = bisect.bisect_left(self._vocabulary, token)
+                if i < len(self._vocabulary) and self._vocabulary[i] == token:
+                    del self._vocabulary[i]
+                    self._short_expansions.clear()
+
+    # ---------- Queries ----------
+
+    def _expand(self, token):
+        """
+        Return vocabulary tokens starting with token, as (token, weight) pairs.
+
+        A one- or two-letter prefix would expand to a large part of the
+        vocabulary, so terms shorter than MIN_PREFIX_LENGTH keep only the
+        whole token and its most common completions, up to
+        SHORT_PREFIX_POSTINGS entries: typing "s" still shows results, just
+        not every entry with an s-word.
+        """
+        short = len(token.lstrip("#")) < MIN_PREFIX_LENGTH
+        if short and token in self._short_expansions:
+            return self._short_expansions[token]
+        i = bisect.bisect_left(self._vocabulary, token)
+        expanded = []
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(token):
+            vocab_token = self._vocabulary[i]
+            expanded.append((vocab_token, 1.0 if vocab_token == token else PREFIX_WEIGHT))
+            i += 1
+        if not short:
+            return expanded
+
+        # The whole token first, then completions by document frequency
+        expanded.sort(key=lambda item: (item[0] != token, -len(self._postings[item[0]])))
+        bounded = []
+        postings = 0
+        for item in expanded:
+            if bounded and postings + len(self._postings[item[0]]) > SHORT_PREFIX_POSTINGS:
+                break
+            bounded.append(item)
+            postings += len(self._postings[item[0]])
+        self._short_expansions[token] = bounded
+        return bounded
+
+    def _term_scores(self, expansions, avg_length, candidates=None, max_documents=None):
+        """
+        {key: BM25 score} for one (prefix-expanded) query term, over the
+        documents containing any expansion (or only those among candidates).
+
+        Each expansion's postings are walked once; a document matching
+        several expansions keeps its best score. Without candidates, at most
+        about max_documents documents are scored, if given.
+        """
+        n_docs = len(self.docs)
+        scores = {}
+        for token, weight in expansions:
+            postings = self._postings[token]
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            factor = weight * idf * (_K1 + 1)
+            if candidates is None and max_documents is not None:
+                if len(scores) >= max_documents:
+                    break
+                matches = itertools.islice(postings.items(), max_documents - len(scores))
+            elif candidates is None:
+                matches = postings.items()
+            elif len(candidates) < len(postings):
+                matches = ((key, postings[key]) for key in candidates if key in postings)
+            else:
+                matches = ((key, tf) for key, tf in postings.items() if key in candidates)
+            for key, tf in matches:
+                length_norm = 1 - _B + _B * len(self._doc_tokens[key]) / avg_length
+                score = factor * tf / (tf + _K1 * length_norm)
+                if token in self._name_tokens[key]:
+                    score *= NAME_BOOST
+                if score > scores.get(key, 0.0):
+                    scores[key] = score
+        return scores
+
+    def _has_phrase(self, key, phrase_tokens):
+        tokens = self._doc_tokens[key]
+        n = len(phrase_tokens)
+        last = phrase_tokens[-1]
+        for i in range(len(tokens) - n + 1):
+            if tokens[i:i + n - 1] == phrase_tokens[:-1] and tokens[i + n - 1].startswith(last):
+                return True
+        return False
+
+    def term_scores(self, tokens):
+        """
+        Return {hex: BM25 score} for the entries containing any of tokens.
+
+        Unlike search(), terms are OR-ed and matched exactly (no prefixes),
+        which suits ranking entries against free text such as a chat prompt.
+        """
+        if not self.docs:
+            return {}
+        avg_length = self._total_length / len(self.docs)
+        scores = defaultdict(float)
+        for token in dict.fromkeys(tokens):
+            if token not in self._postings:
+                continue
+            for key, score in self._term_scores([(token, 1.0)], avg_length).items():
+                scores[key] += score
+        return dict(scores)
+
+    def search(self, query, limit=None):
+        """
+        Return matching entries, best first.
+
+        An empty query returns every entry in insertion order.
+        """
+        terms = []
+        phrases = []
+        for phrase, word in _QUERY_RE.findall(query.lower()):
+            if phrase:
+                phrase_tokens = tokenize(phrase)
+                if phrase_tokens:
+                    phrases.append(phrase_tokens)
+                    terms.extend(phrase_tokens)
+            else:
+                terms.extend(tokenize(word))
+
+        if not terms:
+            entries = list(self.docs.values())
+            return entries[:limit] if limit is not None else entries
+
+        # AND: start from the rarest term and only score the survivors against the rest
+        term_expansions = []
+        for token in dict.fromkeys(terms):
+            expansions = self._expand(token)
+            if not expansions:
+                return []
+            document_count = sum(len(self._postings[t]) for t, _ in expansions)
+            short = len(token.lstrip("#")) < MIN_PREFIX_LENGTH
+            term_expansions.append((document_count, expansions, short))
+        term_expansions.sort(key=lambda item: item[0])
+
+        avg_length = self._total_length / len(self.docs)
+        scores = None
+        for _, expansions, short in term_expansions:
+            # A one- or two-letter term can match a large share of the entries; when it
+            # has to be scored on its own, only so many of them are considered
+            max_documents = SHORT_PREFIX_POSTINGS if short and scores is None else None
+            term_scores = self._term_scores(expansions, avg_length, scores, max_documents)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {key: scores[key] + score for key, score in term_scores.items()}
+            if not scores:
+                return []
+
+        for phrase_tokens in phrases:
+            scores = {key: score for key, score in scores.items() if self._has_phrase(key, phrase_tokens)}
+
+        if limit is not None:
+            ranked = heapq.nsmallest(limit, scores, key=lambda key: (-scores[key], key))
+        else:
+            ranked = sorted(scores, key=lambda key: (-scores[key], key))
+        return [self.docs[key] for key in ranked]
@@ -0,0 +1,359 @@
+"""
+Incremental summaries, built one color family at a time.
+
+The summary is split into a section per color family (the 12 rainbow bands
+of get_color_sort_key, plus neutrals) and the global sections (dark vs light,
+dull vs vibrant, overall). Each stored section remembers a hash of what it
+was generated from, so regenerating after a few edits only asks the model
+about the families whose entries changed, and then re-runs the global
+sections, which are written from the family sections rather than the raw
+data and so are cheap.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from association_store import write_json_atomic
+from token_estimate import estimate_tokens
+from utils import NEUTRAL_FAMILY, RAINBOW_FAMILY_NAMES, get_color_family, get_color_sort_key
+
+SECTIONS_PATH = "db/summary_sections.json"
+# Serializes updates to the sections file across runs, including a cancelled
+# run whose calls are still finishing in the background
+_sections_lock = threading.Lock()
+
+# Model calls made at once while summarizing changed families
+SUMMARY_CONCURRENCY = 4
+# Families whose entries exceed this many (estimated) tokens are summarized in chunks
+CHUNK_TOKEN_BUDGET = 12000
+
+# Families under each top-level heading, in rainbow order
+SUMMARY_GROUPS = (
+    ("WARM COLORS", RAINBOW_FAMILY_NAMES[:5]),
+    ("COOL COLORS", RAINBOW_FAMILY_NAMES[5:]),
+    ("NEUTRAL COLORS", (NEUTRAL_FAMILY,)),
+)
+GROUP_RULE = "-" * 71
+
+FAMILY_PROMPT = """You are an expert at concisely summarizing color associations based on their color categories.
+
+Below are colors from ONE color family ({family}) and their associated synesthetic descriptions. Summarize them as a single section by:
+1. Subcategorizing the colors by HUE (NO MORE THAN 4).  ("Light purples" ✅, "murky yellows" ✅, "earthy greens" ✅)
+2. Summarizing each subcategory and the family as a whole.
+
+Whenever you mention a specific color, ALWAYS include the hex code afterward, like "dark maroon (#3c0008)".
+
+Format the output like this:
+- Use indentation and dashes for subcategorization
+- Categorize the HUES ONLY, not the associations connected to them (e.g. "bright", "dark", "earthy", "muted" shades) and examples
+- Use hanging bullet point format with a bullet for each complete thought
+- No more than 64 characters per line!
+- Avoid markdown formatting.
+- Output ONLY the section, with no heading above it, using the following format:
+
+{title}: [One-sentence summary]
+   - [Subcategory]: [Three-word summary]
+       - [Color name] (#hex): [Three-word summary of association]
+
+{part_note}"""
+
+# Large families are summarized in parts, which this prompt merges into one section
+MERGE_PROMPT = """You are an expert at concisely summarizing color associations based on their color categories.
+
+Below are {parts} partial summaries of the same color family ({family}), each covering different colors. Merge them into ONE section in exactly the same format, with NO MORE THAN 4 hue subcategories, keeping the most representative colors (with their hex codes) in each. No more than 64 characters per line, and no markdown formatting. Output ONLY the section, starting with:
+
+{title}: [One-sentence summary]
+
+"""
+
+GLOBAL_PROMPT = """You are an expert at concisely summarizing color associations.
+
+Below is a summary of someone's synesthetic color associations, family by family. Using it, write ONLY the following three sections, exactly in this format:
+
+=======================================================================
+DARK VS LIGHT:
+[Indented paragraph about dark colors in general. Do not use line breaks]
+
+[Indented paragraph about light colors in general. Do not use line breaks]
+
+
+
+=======================================================================
+DULL VS VIBRANT:
+[Indented paragraph about dull colors in general. Do not use line breaks]
+
+[Indented paragraph about vibrant colors in general. Do not use line breaks]
+
+
+
+=======================================================================
+OVERALL SUMMARY:
+[3-paragraph indented summary with newlines between each paragraph.]
+
+Be concise but insightful. Focus on deeper patterns not explored or obvious from the family summaries. Avoid markdown formatting. Whenever you mention a specific color, ALWAYS include the hex code afterward.
+
+"""
+
+
+def format_entries(entries):
+    return "\n".join(f"{e['xkcd_name']} ({e['hex']}): {e['associations']}" for e in entries)
+
+
+def group_by_family(data):
+    """{family: entries in rainbow order} for the families that have entries"""
+    families = defaultdict(list)
+    for entry in sorted(data, key=lambda e: get_color_sort_key(e["hex"])):
+        families[get_color_family(entry["hex"])].append(entry)
+    return dict(families)
+
+
+def chunk_entries(entries, max_tokens=CHUNK_TOKEN_BUDGET):
+    """Split entries into consecutive runs of at most max_tokens (estimated) each"""
+    chunks = [[]]
+    size = 0
+    for entry in entries:
+        cost = estimate_tokens(format_entries([entry]) + "\n")
+        if chunks[-1] and size + cost > max_tokens:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(entry)
+        size += cost
+    return chunks
+
+
+def build_family_prompt(family, entries, part=None, parts=None):
+    part_note = (f"These colors are part {part} of {parts} of this family; summarize just them.\n\n"
+                 if part is not None else "")
+    return FAMILY_PROMPT.format(family=family, title=family.capitalize(), part_note=part_note) + format_entries(entries)
+
+
+def build_merge_prompt(family, partial_summaries):
+    prompt = MERGE_PROMPT.format(parts=len(partial_summaries), family=family, title=family.capitalize())
+    return prompt + "\n\n".join(
+        f"PART {i}:\n{text}" for i, text in enumerate(partial_summaries, 1)
+    )
+
+
+def build_global_prompt(family_text):
+    return GLOBAL_PROMPT + family_text
+
+
+def section_hash(*parts):
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def load_sections(path=SECTIONS_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            sections = json.load(f)
+    except (OSError, ValueError):
+        return {"families": {}, "global": None}
+    if not isinstance(sections, dict) or not isinstance(sections.get("families"), dict):
+        return {"families": {}, "global": None}
+    return sections
+
+
+def update_sections(update, path=SECTIONS_PATH):
+    """
+    Apply update(sections) to the stored sections and save them.
+
+    The file is re-read under the lock, so overlapping runs add to each
+    other's sections rather than overwriting them.
+    """
+    with _sections_lock:
+        sections = load_sections(path)
+        update(sections)
+        write_json_atomic(path, sections, indent=2, ensure_ascii=False)
+
+
+class StageTimer:
+    """Wall time and call count per stage of a run (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def call(self, stage, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.record(stage, start, time.perf_counter())
+
+    def record(self, stage, start, end):
+        with self._lock:
+            first, last, calls = self._stages.get(stage, (start, end, 0))
+            self._stages[stage] = (min(first, start), max(last, end), calls + 1)
+
+    def report(self):
+        with self._lock:
+            return {
+                stage: {"calls": calls, "seconds": round(last - first, 3)}
+                for stage, (first, last, calls) in self._stages.items()
+            }
+
+
+class IncrementalSummarizer:
+    """
+    Produces the full summary, reusing stored sections whose inputs haven't changed.
+
+    generate(prompt) -> text makes one model call; stream(prompt), if given,
+    yields the text of one in chunks and is used for the global sections,
+    which come last. model is part of every section hash, so switching
+    models regenerates everything.
+
+    Changed families are summarized map-reduce style: every family (or, for
+    a family too large for one prompt, every chunk of at most chunk_tokens)
+    is summarized concurrently on up to `concurrency` threads, a chunked
+    family's partial summaries are merged into its section by one more call,
+    and the family sections are finally reduced into the global sections.
+
+    last_run records which families were regenerated and which reused, and
+    the calls made and wall time taken by each stage ("map", "merge",
+    "reduce").
+    """
+
+    def __init__(self, generate, stream=None, model="", path=SECTIONS_PATH,
+                 concurrency=SUMMARY_CONCURRENCY, chunk_tokens=CHUNK_TOKEN_BUDGET):
+        self.generate = generate
+        self.stream_prompt = stream
+        self.model = model
+        self.path = path
+        self.concurrency = max(1, concurrency)
+        self.chunk_tokens = chunk_tokens
+        self.last_run = {}
+
+    def _summarize_family(self, family, entries, executor, timer):
+        """Start summarizing one family; returns a Future of its section text"""
+        chunks = chunk_entries(entries, self.chunk_tokens)
+        if len(chunks) == 1:
+            return executor.submit(timer.call, "map", self.generate, build_family_prompt(family, entries))
+
+        section = Future()
+        partials = [
+            executor.submit(timer.call, "map", self.generate, build_family_prompt(family, chunk, part, len(chunks)))
+            for part, chunk in enumerate(chunks, 1)
+        ]
+        remaining = [len(partials)]
+        lock = threading.Lock()
+
+        def merge(merge_future):
+            try:
+                section.set_result(merge_future.result())
+            except Exception as e:
+                section.set_exception(e)
+
+        def partial_done(_):
+            # The merge starts as soon as the family's last chunk is done
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            try:
+                texts = [f.result().strip() for f in partials]
+                prompt = build_merge_prompt(family, texts)
+                executor.submit(timer.call, "merge", self.generate, prompt).add_done_callback(merge)
+            except Exception as e:
+                # A failed chunk, or the run was cancelled and the executor shut down
+                section.set_exception(e)
+
+        for partial in partials:
+            partial.add_done_callback(partial_done)
+        return section
+
+    def stream(self, data):
+        """
+        Yield the summary text piece by piece, in order.
+
+        Each family section is stored as soon as its call completes, whatever
+        the order, so an interrupted run still saves every family that
+        finishes (including those finishing after it was cancelled) for the
+        next one.
+        """
+        started = time.perf_counter()
+        timer = StageTimer()
+        sections = load_sections(self.path)
+        stored = sections["families"]
+        families = group_by_family(data)
+
+        digests = {}
+        for family, entries in families.items():
+            digests[family] = section_hash(self.model, build_family_prompt(family, entries))
+        stale = [f for f in families if stored.get(f, {}).get("hash") != digests[f]]
+
+        def store_family(family, future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            section = {"hash": digests[family], "text": future.result().strip()}
+            update_sections(lambda sections: sections["families"].__setitem__(family, section), self.path)
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="mindpalette-summary")
+        try:
+            # Every changed family is started up front; sections are still yielded in rainbow order
+            pending = {f: self._summarize_family(f, families[f], executor, timer) for f in stale}
+            for family, future in pending.items():
+                future.add_done_callback(lambda future, family=family: store_family(family, future))
+
+            family_texts = []
+            first_group = True
+            for heading, group in SUMMARY_GROUPS:
+                present = [family for family in group if family in families]
+                if not present:
+                    continue
+                yield ("" if first_group else "\n\n\n") + f"{heading}\n{GROUP_RULE}\n"
+                first_group = False
+                for i, family in enumerate(present):
+                    if family in pending:
+                        text = pending[family].result().strip()
+                        stored[family] = {"hash": digests[family], "text": text}
+                    else:
+                        text = stored[family]["text"]
+                    family_texts.append(text)
+                    yield ("\n" if i else "") + text + "\n"
+        finally:
+            # Stops queued calls if the run is abandoned (e.g. cancelled by the user)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        yield "\n\n\n"
+        global_prompt = build_global_prompt("\n\n".join(family_texts))
+        digest = section_hash(self.model, global_prompt)
+        section = sections.get("global")
+        if section and section.get("hash") == digest:
+            yield section["text"]
+            global_regenerated = False
+        else:
+            if self.stream_prompt is not None:
+                parts = []
+                reduce_started = time.perf_counter()
+                for chunk in self.stream_prompt(global_prompt):
+                    parts.append(chunk)
+                    yield chunk
+                text = "".join(parts)
+                timer.record("reduce", reduce_started, time.perf_counter())
+            else:
+                text = timer.call("reduce", self.generate, global_prompt)
+                yield text
+            sections["global"] = {"hash": digest, "text": text}
+            global_regenerated = True
+
+        def finish(stored_sections):
+            # Families with no entries left drop out of the store
+            for family in set(stored_sections["families"]) - set(families):
+                del stored_sections["families"][family]
+            stored_sections["global"] = sections.get("global")
+
+        update_sections(finish, self.path)
+
+        self.last_run = {
+            "regenerated": stale,
+            "reused": [f for f in families if f not in stale],
+            "global_regenerated": global_regenerated,
+            "stages": timer.report(),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def summarize(self, data):
+        return "".join(self.stream(data))
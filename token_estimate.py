@@ -0,0 +1,13 @@
+"""
+Token counts estimated from text length.
+
+Kept free of other imports so lightweight tools (the metrics CLI, the fake
+backend) can use it without loading the app.
+"""
+
+# Rough size of a token in English text, for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
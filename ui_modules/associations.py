@@ -3,9 +3,22 @@ from tkinter import ttk, messagebox, filedialog
 import json
 import os
 import csv
+import re
 from PIL import Image, ImageDraw
 import io
-from utils import load_database, setup_cross_platform_scrolling, sort_colors_by_rainbow
+from color_index import color_name_for_hex
+from search_index import tokenize
+from ui_modules.search import DebouncedSearch
+from ui_modules.virtual_table import VirtualTable
+from utils import (
+    load_sorted_database, save_to_database, delete_from_database, save_many,
+    setup_cross_platform_scrolling, subscribe_to_changes, search_associations, get_rainbow_view,
+    UPSERTED, DELETED
+)
+
+# Search results shown at most, best first; ranking more than a screenful of
+# pages only costs time on the Tk thread, and a longer query narrows them down
+SEARCH_RESULT_LIMIT = 500
 
 
 class AssociationsTab:
@@ -13,6 +26,7 @@ class AssociationsTab:
         self.parent = parent
         self.refresh_callback = refresh_callback
         self.setup_ui()
+        subscribe_to_changes(self.on_database_changed)
 
     def setup_ui(self):
         for widget in self.parent.winfo_children():
@@ -26,49 +40,64 @@ class AssociationsTab:
         self.search_var = tk.StringVar()
         self.search_entry = tk.Entry(search_frame, textvariable=self.search_var, width=40)
         self.search_entry.pack(side="left", padx=(0, 5))
-        self.search_var.trace("w", self.filter_associations)
 
-        # Load database data
-        self.all_associations_data = load_database()
+        # Debounced, incremental filtering of the loaded associations
+        self.search = DebouncedSearch(
+            self.parent, self.search_var, association_matches, self.filter_associations,
+            search=lambda query: search_associations(query, limit=SEARCH_RESULT_LIMIT)
+        )
+        self.shown_query = ""
 
-        # Create main frame with scrollbar
+        # Create main frame with header and scrollable table
         main_frame = tk.Frame(self.parent)
         main_frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
 
-        # Create canvas and scrollbar
-        canvas = tk.Canvas(main_frame)
-        scrollbar = ttk.Scrollbar(main_frame, orient="vertical", command=canvas.yview)
-        self.scrollable_frame = tk.Frame(canvas)
+        # Create header (stays in place while the rows scroll)
+        header_frame = tk.Frame(main_frame)
+        header_frame.pack(fill="x", pady=(0, 3))
+        
+        tk.Label(header_frame, text="Color", font=("Arial", 10, "bold"), width=8).pack(side="left", padx=(0, 2))
+        tk.Label(header_frame, text="Name", font=("Arial", 10, "bold"), width=8).pack(side="left", padx=(0, 4))
+        tk.Label(header_frame, text="Hex Code", font=("Arial", 10, "bold"), width=10).pack(side="left", padx=(15, 2))
+        tk.Label(header_frame, text="Associations", font=("Arial", 10, "bold"), width=18).pack(side="left", padx=(0, 2))
+
+        # Create separator
+        separator = ttk.Separator(main_frame, orient="horizontal")
+        separator.pack(fill="x", pady=(0, 3))
 
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        # Virtualized table: only the rows in view have widgets
+        table_frame = tk.Frame(main_frame)
+        table_frame.pack(fill="both", expand=True)
+        self.table = VirtualTable(
+            table_frame,
+            create_row=self.create_association_row,
+            update_row=self.update_association_row,
+            empty_text="No associations found.",
+            key=lambda entry: entry["hex"].lower(),
+            highlightthickness=0
         )
-
-        canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        self.table.pack()
 
         # Store the canvas for filtering
-        self.associations_canvas = canvas
-        self.associations_scrollbar = scrollbar
-
-        # Pack canvas and scrollbar
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.associations_canvas = self.table.canvas
+        self.associations_scrollbar = self.table.scrollbar
 
         # Set up cross-platform scrolling
-        setup_cross_platform_scrolling(canvas, self.scrollable_frame)
+        setup_cross_platform_scrolling(self.table.canvas, self.table.canvas)
 
         # Button frame for side-by-side buttons
         button_frame = tk.Frame(self.parent)
         button_frame.pack(pady=10)
         
-        # Export to Excel button (removed Refresh Table button)
+        # Import and Export to Excel buttons (removed Refresh Table button)
+        import_button = tk.Button(button_frame, text="Import Data...", command=self.import_associations)
+        import_button.pack(side="left", padx=(0, 5))
+
         export_button = tk.Button(button_frame, text="Export Data to Excel", command=self.export_associations_to_excel)
-        export_button.pack()
+        export_button.pack(side="left", padx=(5, 0))
 
         # Initial population of the table
-        self.populate_associations_table()
+        self.refresh_table()
 
     def switch_to_colors_tab(self, hex_code):
         """Switch to the Colors tab and display the specified color"""
@@ -87,91 +116,117 @@ class AssociationsTab:
 
     def refresh_table(self):
         """Refresh the associations table with latest data"""
-        self.all_associations_data = load_database()
-        self.populate_associations_table(self.search_var.get())
-
-    def populate_associations_table(self, filter_text=""):
-        # Clear existing content
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-
-        if not self.all_associations_data:
-            tk.Label(self.scrollable_frame, text="No associations found.", font=("Arial", 12)).pack(pady=20)
-            return
-
-        # Filter data if search text is provided
-        if filter_text:
-            filtered_data = []
-            filter_lower = filter_text.lower()
-            for entry in self.all_associations_data:
-                if (filter_lower in entry['xkcd_name'].lower() or 
-                    filter_lower in entry['hex'].lower() or 
-                    filter_lower in entry['associations'].lower()):
-                    filtered_data.append(entry)
-            sorted_db = sort_colors_by_rainbow(filtered_data)
-        else:
-            sorted_db = sort_colors_by_rainbow(self.all_associations_data)
-
-        # Create header
-        header_frame = tk.Frame(self.scrollable_frame)
-        header_frame.pack(fill="x", pady=(0, 3))
+        # Already in rainbow order: the shared view is kept sorted as entries change
+        self.all_associations_data = load_sorted_database()
+        self.search.set_items(self.all_associations_data)
+
+    def populate_associations_table(self, entries, keep_position=False):
+        # Search results keep their relevance order; the full list is already in rainbow order.
+        # Only the visible rows are rendered
+        self.table.set_rows(entries, keep_position=keep_position)
+
+    def create_association_row(self, parent):
+        """Create the (reusable) widgets for one association row"""
+        row_frame = tk.Frame(parent)
+        row_frame.entry = None
+
+        # Color square - make it clickable
+        row_frame.color_canvas = tk.Canvas(row_frame, width=20, height=20, relief="solid", bd=1, cursor="hand2")
+        row_frame.color_canvas.pack(side="left", padx=(0, 2))
         
-        tk.Label(header_frame, text="Color", font=("Arial", 10, "bold"), width=8).pack(side="left", padx=(0, 2))
-        tk.Label(header_frame, text="Name", font=("Arial", 10, "bold"), width=8).pack(side="left", padx=(0, 4))
-        tk.Label(header_frame, text="Hex Code", font=("Arial", 10, "bold"), width=10).pack(side="left", padx=(15, 2))
-        tk.Label(header_frame, text="Associations", font=("Arial", 10, "bold"), width=18).pack(side="left", padx=(0, 2))
-
-        # Create separator
-        separator = ttk.Separator(self.scrollable_frame, orient="horizontal")
-        separator.pack(fill="x", pady=(0, 3))
-
-        # Create rows for each association
-        for entry in sorted_db:
-            row_frame = tk.Frame(self.scrollable_frame)
-            row_frame.pack(fill="x", pady=0)
-
-            # Color square - make it clickable
-            color_canvas = tk.Canvas(row_frame, width=20, height=20, bg=entry['hex'], relief="solid", bd=1, cursor="hand2")
-            color_canvas.pack(side="left", padx=(0, 2))
-            
-            # Bind click event to switch to colors tab
-            color_canvas.bind("<Button-1>", lambda e, hex_code=entry['hex']: self.switch_to_colors_tab(hex_code))
-
-            # Color name
-            name_label = tk.Label(row_frame, text=entry['xkcd_name'], width=12, anchor="w")
-            name_label.pack(side="left", padx=(0))
-
-            # Hex code
-            hex_label = tk.Label(row_frame, text=entry['hex'], width=7, anchor="w")
-            hex_label.pack(side="left", padx=(0))
-
-            # Associations (truncated if too long)
-            associations = entry['associations']
-            if len(associations) > 65:
-                associations = associations[:62] + "..."
-            assoc_label = tk.Label(row_frame, text=associations, width=45, anchor="w", justify="left")
-            assoc_label.pack(side="left", padx=(0, 2))
-
-            # Edit button
-            edit_button = tk.Button(row_frame, text="Edit", command=lambda e=entry: self.edit_association(e))
-            edit_button.pack(side="left", padx=(0, 2))
-
-            # ✕ delete label styled as a hyperlink
-            delete_label = tk.Label(
-                row_frame,
-                text="✕",
-                fg="grey",
-                font=("Arial", 10, "bold"),
-                bg=row_frame.cget("bg")
-            )
-            delete_label.pack(side="left", pady=(2))
-            delete_label.bind("<Button-1>", lambda e, entry=entry: self.delete_association(entry))
-
-    def filter_associations(self, *args):
-        filter_text = self.search_var.get()
-        self.populate_associations_table(filter_text)
-        # Scroll to top after filtering
-        self.associations_canvas.yview_moveto(0)
+        # Bind click event to switch to colors tab
+        row_frame.color_canvas.bind("<Button-1>", lambda e: self.switch_to_colors_tab(row_frame.entry['hex']))
+
+        # Color name
+        row_frame.name_label = tk.Label(row_frame, width=12, anchor="w")
+        row_frame.name_label.pack(side="left", padx=(0))
+
+        # Hex code
+        row_frame.hex_label = tk.Label(row_frame, width=7, anchor="w")
+        row_frame.hex_label.pack(side="left", padx=(0))
+
+        # Associations (truncated if too long)
+        row_frame.assoc_label = tk.Label(row_frame, width=45, anchor="w", justify="left")
+        row_frame.assoc_label.pack(side="left", padx=(0, 2))
+
+        # Edit button
+        edit_button = tk.Button(row_frame, text="Edit", command=lambda: self.edit_association(row_frame.entry))
+        edit_button.pack(side="left", padx=(0, 2))
+
+        # ✕ delete label styled as a hyperlink
+        delete_label = tk.Label(
+            row_frame,
+            text="✕",
+            fg="grey",
+            font=("Arial", 10, "bold"),
+            bg=row_frame.cget("bg")
+        )
+        delete_label.pack(side="left", pady=(2))
+        delete_label.bind("<Button-1>", lambda e: self.delete_association(row_frame.entry))
+        return row_frame
+
+    def update_association_row(self, row_frame, entry):
+        """Fill a recycled row with an association entry"""
+        row_frame.entry = entry
+        row_frame.color_canvas.config(bg=entry['hex'])
+        row_frame.name_label.config(text=entry['xkcd_name'])
+        row_frame.hex_label.config(text=entry['hex'])
+
+        associations = entry['associations']
+        if len(associations) > 65:
+            associations = associations[:62] + "..."
+        row_frame.assoc_label.config(text=associations)
+
+    def on_database_changed(self, changes):
+        """
+        Patch the changed rows in place when associations change.
+
+        The full list is kept in step with the shared rainbow view, which has
+        already been updated. Search results are only re-queried when a change
+        could add an entry to them (or promote one past the result limit).
+        """
+        hexes = dict.fromkeys(c.hex.lower() for c in changes if c.kind in (UPSERTED, DELETED))
+        if not hexes:
+            return
+        view = get_rainbow_view()
+        query = self.shown_query
+        truncated = len(self.table.rows) >= SEARCH_RESULT_LIMIT
+        requery = False
+        inserts = []
+        for hex_code in hexes:
+            row = self.table.index_of(hex_code)
+            position = view.index(hex_code)
+            entry = view[position] if position is not None else None
+            if not query:
+                if entry is None:
+                    if row is not None:
+                        self.table.remove_row(row)
+                elif row is not None:
+                    self.table.replace_row(row, entry)
+                else:
+                    inserts.append(position)
+            elif entry is not None and could_match_search(entry, query):
+                if row is not None:
+                    self.table.replace_row(row, entry)
+                else:
+                    requery = True
+            elif row is not None:
+                self.table.remove_row(row)
+                requery = requery or truncated
+        # Replacing an entry never moves it, so once removals and replacements
+        # are done, inserting in rainbow order puts each entry at its position
+        for position in sorted(inserts):
+            self.table.insert_row(position, view[position])
+
+        self.all_associations_data = view.entries()
+        self.search.update_items(self.all_associations_data)
+        if requery:
+            self.search.run_now()
+
+    def filter_associations(self, results, query):
+        # Scroll back to the top when the search changed, keep the position on data refreshes
+        self.populate_associations_table(results, keep_position=(query == self.shown_query))
+        self.shown_query = query
 
     def edit_association(self, entry):
         # Create edit dialog
@@ -221,22 +276,10 @@ class AssociationsTab:
         def save_changes():
             new_associations = text_widget.get("1.0", tk.END).strip()
             if new_associations:
-                # Update the entry
-                entry['associations'] = new_associations
-                
-                # Update the database
-                db = load_database()
-                for i, db_entry in enumerate(db):
-                    if db_entry['hex'] == entry['hex']:
-                        db[i] = entry
-                        break
-                
-                # Save to file
-                with open("db/associations.json", "w") as f:
-                    json.dump(db, f, indent=4)
-                
+                # Update the entry (the change subscription patches the table)
+                save_to_database({**entry, 'associations': new_associations})
+
                 dialog.destroy()
-                self.setup_ui()  # Refresh the table
             else:
                 messagebox.showerror("Error", "Associations cannot be empty.")
         
@@ -254,14 +297,40 @@ class AssociationsTab:
         if not confirm:
             return
 
-        db = load_database()
-        db = [e for e in db if e["hex"] != entry["hex"]]
+        # The change subscription patches the table
+        delete_from_database(entry["hex"])
+
+    def import_associations(self):
+        """Import associations from a JSON list or a CSV file with hex, xkcd_name and associations columns"""
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Association files", "*.json *.csv"), ("JSON files", "*.json"), ("CSV files", "*.csv")],
+            title="Import Associations"
+        )
+
+        if not file_path:
+            return  # User canceled
+
+        try:
+            if file_path.lower().endswith(".csv"):
+                # utf-8-sig drops the BOM Excel writes, which would otherwise become part of the first header
+                with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+                    rows = list(csv.DictReader(f))
+            else:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    rows = json.load(f)
+        except (OSError, ValueError, csv.Error) as e:
+            messagebox.showerror("Error", f"Failed to read import file: {str(e)}")
+            return
 
-        with open("db/associations.json", "w") as f:
-            json.dump(db, f, indent=4)
+        entries = parse_import_rows(rows)
+        if not entries:
+            messagebox.showinfo("Import", "No valid associations found in the file.")
+            return
 
-        self.all_associations_data = db
-        self.populate_associations_table(self.search_var.get())
+        # One batched write and one change notification for the whole file
+        # (imported colors also leave the save for later list)
+        save_many(entries)
+        messagebox.showinfo("Import", f"Imported {len(entries)} associations.")
 
     def export_associations_to_excel(self):
         try:
@@ -271,14 +340,12 @@ class AssociationsTab:
             messagebox.showerror("Error", "openpyxl is required for Excel export. Please install it with: pip install openpyxl")
             return
 
-        db = load_database()
-        if not db:
+        # Rainbow order, same as the table display
+        sorted_db = load_sorted_database()
+        if not sorted_db:
             messagebox.showinfo("Export", "No associations to export.")
             return
 
-        # Sort the data by hue (same as table display)
-        sorted_db = sort_colors_by_rainbow(db)
-
         file_path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
             filetypes=[("Excel files", "*.xlsx")],
@@ -349,4 +416,48 @@ class AssociationsTab:
             messagebox.showinfo("Export", f"Associations exported to {file_path}")
             
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to export to Excel: {str(e)}") 
\ No newline at end of file
+            messagebox.showerror("Error", f"Failed to export to Excel: {str(e)}") 
+
+def could_match_search(entry, query):
+    """
+    Whether entry could be among search_associations(query)'s results.
+
+    Conservative: true for near: queries, and whenever any query term occurs
+    anywhere in the entry.
+    """
+    terms = tokenize(query)
+    if query.startswith("near:") or not terms:
+        return True
+    text = " ".join((entry['xkcd_name'], entry['hex'], entry['associations'])).lower()
+    return any(term in text for term in terms)
+
+
+def association_matches(entry, query):
+    """Search predicate for the Associations tab (query is already lowercased)"""
+    return (query in entry['xkcd_name'].lower() or
+            query in entry['hex'].lower() or
+            query in entry['associations'].lower())
+
+
+_HEX_CODE_RE = re.compile(r"#[0-9a-f]{6}")
+
+
+def parse_import_rows(rows):
+    """Turn imported JSON/CSV rows into association entries, skipping invalid ones"""
+    if not isinstance(rows, list):
+        return []
+
+    entries = {}
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        hex_code = str(row.get("hex", "")).strip().lower()
+        associations = str(row.get("associations", "")).strip()
+        if not _HEX_CODE_RE.fullmatch(hex_code) or not associations:
+            continue
+        entries[hex_code] = {
+            "hex": hex_code,
+            "xkcd_name": str(row.get("xkcd_name", "")).strip() or color_name_for_hex(hex_code),
+            "associations": associations
+        }
+    return list(entries.values())
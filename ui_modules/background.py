@@ -0,0 +1,201 @@
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+# Backend calls are network-bound, so a couple of threads is plenty
+MAX_WORKERS = 2
+# How often (ms) the Tk thread checks for results while any work is pending;
+# about one frame, so streamed text is drawn as it arrives
+POLL_INTERVAL = 16
+
+
+class WorkerPool:
+    """
+    A small pool of daemon threads running submitted jobs in order.
+
+    The threads are daemons so a request still waiting on the network never
+    keeps the app from closing (concurrent.futures joins its workers at exit).
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.max_workers = max_workers
+        self._jobs = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        with self._lock:
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._work, name=f"mindpalette-worker-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        self._jobs.put(job)
+
+    def _work(self):
+        while True:
+            self._jobs.get()()
+
+
+_pool = None
+
+
+def get_worker_pool():
+    """Return the shared worker pool (threads are started on first use)"""
+    global _pool
+    if _pool is None:
+        _pool = WorkerPool()
+    return _pool
+
+
+class BackgroundTask:
+    """
+    Handle for one call running on the worker pool.
+
+    cancel() can't interrupt a request already in flight, but it guarantees
+    none of the task's callbacks run afterwards, so a late result is dropped.
+    """
+
+    def __init__(self, on_success, on_error, on_finish, on_chunk=None):
+        self.on_chunk = on_chunk
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_finish = on_finish
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+
+class BackgroundRunner:
+    """
+    Runs blocking calls off the Tk thread and hands their results back to it.
+
+    Workers never touch Tk: they put results on a queue, which the Tk thread
+    drains on its after() loop, so callbacks always run on the Tk thread.
+    on_success(result) or on_error(exception) is called when the call
+    returns, then on_finish(); nothing is called for a cancelled task.
+
+    stream() does the same for a call returning an iterator of text chunks:
+    on_chunk(text) receives everything that arrived since the previous poll
+    in one piece, so a widget gets one insert per frame rather than one per
+    chunk, and on_success gets the complete text.
+    """
+
+    def __init__(self, widget, pool=None):
+        self.widget = widget
+        self.pool = pool or get_worker_pool()
+        self._results = queue.Queue()
+        self._pending = 0
+        self._poll_id = None
+
+    def submit(self, fn, *args, on_success=None, on_error=None, on_finish=None):
+        task = BackgroundTask(on_success, on_error, on_finish)
+
+        def job():
+            if task.cancelled():
+                self._results.put((task, "cancelled", None))
+                return
+            try:
+                self._results.put((task, "done", fn(*args)))
+            except Exception as e:
+                self._results.put((task, "error", e))
+
+        return self._start(task, job)
+
+    def stream(self, fn, *args, on_chunk=None, on_success=None, on_error=None, on_finish=None):
+        task = BackgroundTask(on_success, on_error, on_finish, on_chunk)
+
+        def job():
+            chunks = []
+            try:
+                iterator = fn(*args)
+                for chunk in iterator:
+                    if task.cancelled():
+                        # Stop reading; closing the generator ends the request
+                        getattr(iterator, "close", lambda: None)()
+                        self._results.put((task, "cancelled", None))
+                        return
+                    chunks.append(chunk)
+                    self._results.put((task, "chunk", chunk))
+                self._results.put((task, "done", "".join(chunks)))
+            except Exception as e:
+                self._results.put((task, "error", e))
+
+        return self._start(task, job)
+
+    def _start(self, task, job):
+        self._pending += 1
+        self.pool.submit(job)
+        self._schedule_poll()
+        return task
+
+    def busy(self):
+        return self._pending > 0
+
+    def _schedule_poll(self):
+        if self._poll_id is None:
+            self._poll_id = self.widget.after(POLL_INTERVAL, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        try:
+            # Consecutive chunks of a task are joined into a single on_chunk call
+            text_task, text = None, []
+            while True:
+                try:
+                    task, kind, value = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if text and (kind != "chunk" or task is not text_task):
+                    self._deliver_chunk(text_task, text)
+                    text = []
+                if kind == "chunk":
+                    text_task = task
+                    text.append(value)
+                    continue
+                self._pending -= 1
+                if not task.cancelled():
+                    self._deliver(task, kind, value)
+            if text:
+                self._deliver_chunk(text_task, text)
+        finally:
+            if self._pending:
+                self._schedule_poll()
+
+    def _deliver_chunk(self, task, text):
+        if task.on_chunk and not task.cancelled():
+            task.on_chunk("".join(text))
+
+    def _deliver(self, task, kind, value):
+        try:
+            if kind == "error":
+                if task.on_error:
+                    task.on_error(value)
+            elif kind == "done" and task.on_success:
+                task.on_success(value)
+        finally:
+            if task.on_finish:
+                task.on_finish()
+
+
+class BusyIndicator(tk.Frame):
+    """Indeterminate progress bar with a status label and a Cancel button"""
+
+    def __init__(self, parent, text, on_cancel):
+        super().__init__(parent)
+        tk.Label(self, text=text).pack(side="left", padx=(0, 8))
+        self.progress = ttk.Progressbar(self, mode="indeterminate", length=160)
+        self.progress.pack(side="left", padx=(0, 8))
+        tk.Button(self, text="Cancel", command=on_cancel).pack(side="left")
+
+    def show(self, **pack_options):
+        self.pack(**pack_options)
+        self.progress.start(15)
+
+    def hide(self):
+        self.progress.stop()
+        self.pack_forget()
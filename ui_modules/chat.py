@@ -2,16 +2,25 @@ import tkinter as tk
 from tkinter import messagebox, filedialog
 import json
 import os
-from gemini_backend import generate_chat_response, has_api_key
+from typing import Optional
+from assistant import clear_response_cache, stream_chat_response
+from gemini_backend import get_backend
+from llm_backend import LLMBackend
 from key_bindings import apply_text_navigation_bindings, bind_enter_to_submit
 from utils import load_database, setup_cross_platform_scrolling, get_link_colors
 from ui_modules.popups.api_key_popup import APIKeyPopup
+from ui_modules.search import DebouncedSearch
+from ui_modules.background import BackgroundRunner, BusyIndicator
 
 
 class ChatTab:
-    def __init__(self, parent, refresh_all_callback=None):
+    def __init__(self, parent, refresh_all_callback=None, backend: Optional[LLMBackend] = None):
         self.parent = parent
         self.refresh_all_callback = refresh_all_callback
+        # Any LLMBackend (e.g. fake_backend.FakeBackend); Gemini by default
+        self.backend = backend or get_backend()
+        self.runner = BackgroundRunner(parent)
+        self._task = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -19,7 +28,7 @@ class ChatTab:
             widget.destroy()
 
         # Check if API key is available
-        if not has_api_key():
+        if not self.backend.has_api_key():
             self.show_api_key_message()
             return
 
@@ -32,6 +41,8 @@ class ChatTab:
         self.chat_button = tk.Button(self.parent, text="Generate Response", command=self.generate_chat)
         self.chat_button.pack(pady=5)
 
+        self.busy_indicator = BusyIndicator(self.parent, "Generating response…", self.cancel_chat)
+
         self.chat_output_frame = tk.Frame(self.parent)
         self.chat_output_frame.pack(padx=80, pady=10, fill="both", expand=True)
 
@@ -46,7 +57,7 @@ class ChatTab:
         # Set up cross-platform scrolling
         setup_cross_platform_scrolling(self.chat_response_text)
 
-        # Button frame with Save, View, Export
+        # Button frame with Save, View, Export, Clear Cache
         chat_button_frame = tk.Frame(self.parent)
         chat_button_frame.pack(pady=5)
 
@@ -62,6 +73,13 @@ class ChatTab:
         self.export_chat_button = tk.Button(chat_button_frame, text="Export to .txt", command=self.export_chat_response)
         self.export_chat_button.pack(side="left", padx=(5, 0))
 
+        # Clear Cache button (a repeated prompt is otherwise answered from the cache until the data changes)
+        self.clear_cache_button = tk.Button(chat_button_frame, text="Clear Cached Responses", command=self.clear_cached_responses)
+        self.clear_cache_button.pack(side="left", padx=(5, 0))
+
+        # Keep showing a request that was started before the tab was rebuilt
+        self.set_busy(self._task is not None)
+
     def generate_chat(self):
         prompt = self.chat_entry.get("1.0", tk.END).strip()
         if not prompt:
@@ -73,14 +91,56 @@ class ChatTab:
             messagebox.showinfo("Chat", "Database is empty.")
             return
 
+        if self._task is not None:
+            return
+
+        # The response streams in on a worker thread, so the window stays
+        # responsive and text appears as soon as the first chunk arrives
+        self.chat_response_text.config(state="normal")
+        self.chat_response_text.delete("1.0", tk.END)
+        self.chat_response_text.config(state="disabled")
+        self._task = self.runner.stream(
+            stream_chat_response, self.backend, prompt, db,
+            on_chunk=self.append_chat_response,
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to generate response: {str(e)}"),
+            on_finish=self.finish_chat,
+        )
+        self.set_busy(True)
+
+    def append_chat_response(self, text):
+        if not self.chat_response_text.winfo_exists():
+            return
+        self.chat_response_text.config(state="normal")
+        self.chat_response_text.insert(tk.END, text)
+        self.chat_response_text.config(state="disabled")
+
+    def cancel_chat(self):
+        if self._task is not None:
+            self._task.cancel()
+        self.finish_chat()
+
+    def finish_chat(self):
+        self._task = None
+        self.set_busy(False)
+
+    def set_busy(self, busy):
+        # The tab may have been rebuilt (or show the API key message) meanwhile
+        button = getattr(self, "chat_button", None)
+        if button is None or not button.winfo_exists():
+            return
+        button.config(state="disabled" if busy else "normal")
+        if busy:
+            self.busy_indicator.show(after=button, pady=(0, 5))
+        else:
+            self.busy_indicator.hide()
+
+    def clear_cached_responses(self):
         try:
-            response = generate_chat_response(prompt, db)
-            self.chat_response_text.config(state="normal")
-            self.chat_response_text.delete("1.0", tk.END)
-            self.chat_response_text.insert("1.0", response)
-            self.chat_response_text.config(state="disabled")
+            removed = clear_response_cache("chat")
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate response: {str(e)}")
+            messagebox.showerror("Error", f"Failed to clear cached responses: {str(e)}")
+            return
+        messagebox.showinfo("Chat", f"Cleared {removed} cached response{'s' if removed != 1 else ''}.")
 
     def save_chat_to_file(self):
         prompt = self.chat_entry.get("1.0", tk.END).strip()
@@ -157,6 +217,14 @@ class ChatTab:
         detail_frame = tk.Frame(window)
         detail_frame.pack(side="right", fill="both", expand=True, padx=10, pady=10)
 
+        # Search box for the saved chats
+        search_frame = tk.Frame(list_frame)
+        search_frame.pack(fill="x", pady=(0, 6))
+        tk.Label(search_frame, text="Search:", font=("Arial", 12)).pack(side="left")
+        query_var = tk.StringVar()
+        search_entry = tk.Entry(search_frame, textvariable=query_var)
+        search_entry.pack(side="left", fill="x", expand=True, padx=(5, 0))
+
         # Listbox for prompts
         listbox = tk.Listbox(list_frame, width=40, font=("Arial", 14))
         listbox.pack(fill="y", expand=True)
@@ -177,12 +245,21 @@ class ChatTab:
         response_text.pack(fill="both", expand=True)
         response_text.config(state="disabled")
 
+        # Chats currently listed, in listbox order
+        shown_chats = []
+
         # Populate listbox with prompt previews
-        for i, chat in enumerate(saved_chats):
-            preview = chat["prompt"].strip().replace("\n", " ")
-            if len(preview) > 80:
-                preview = preview[:77] + "..."
-            listbox.insert(tk.END, preview)
+        def show_results(results, query):
+            shown_chats[:] = results
+            listbox.delete(0, tk.END)
+            for chat in results:
+                preview = chat["prompt"].strip().replace("\n", " ")
+                if len(preview) > 80:
+                    preview = preview[:77] + "..."
+                listbox.insert(tk.END, preview)
+
+        search = DebouncedSearch(window, query_var, chat_matches, show_results)
+        search.set_items(saved_chats)
 
         # Display full chat when selected
         def on_select(event):
@@ -190,7 +267,7 @@ class ChatTab:
             if not selection:
                 return
             index = selection[0]
-            chat = saved_chats[index]
+            chat = shown_chats[index]
 
             prompt_text.config(state="normal")
             prompt_text.delete("1.0", tk.END)
@@ -215,11 +292,12 @@ class ChatTab:
             if not confirm:
                 return
 
-            del saved_chats[index]
+            chat = shown_chats[index]
+            saved_chats[:] = [c for c in saved_chats if c is not chat]
             with open(save_path, "w", encoding="utf-8") as f:
                 json.dump(saved_chats, f, indent=4)
 
-            listbox.delete(index)
+            search.set_items(saved_chats)
 
             prompt_text.config(state="normal")
             prompt_text.delete("1.0", tk.END)
@@ -289,4 +367,9 @@ class ChatTab:
     def open_api_key_help(self, event=None):
         """Open help for adding API key"""
         callback = self.refresh_all_callback if self.refresh_all_callback else self.setup_ui
-        APIKeyPopup(self.parent, refresh_callback=callback) 
\ No newline at end of file
+        APIKeyPopup(self.parent, refresh_callback=callback)
+
+
+def chat_matches(chat, query):
+    """Search predicate for saved chats (query is already lowercased)"""
+    return query in chat["prompt"].lower() or query in chat["response"].lower()
@@ -1,13 +1,30 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from matplotlib import colors as mcolors
-from utils import load_database, save_to_database, setup_cross_platform_scrolling, load_saved_for_later, save_to_saved_for_later, remove_from_saved_for_later, sort_colors_by_rainbow, get_link_colors, get_text_colors
+from color_catalog import get_xkcd_catalog, get_css4_catalog
+from color_index import EXACT_DELTA_E, color_name_for_hex, nearest_named_color
+from ui_modules.search import DebouncedSearch
+from ui_modules.virtual_table import VirtualTable
+from utils import load_database, get_association, save_to_database, setup_cross_platform_scrolling, load_saved_for_later, load_sorted_saved_for_later, save_to_saved_for_later, remove_from_saved_for_later, get_link_colors, get_text_colors, subscribe_to_changes, nearest_associations, UPSERTED, DELETED
+
+# How often similar colors are retried while the color index is built
+SIMILAR_RETRY_MS = 100
 
 
 class ColorsTab:
     def __init__(self, parent):
         self.parent = parent
+        self._similar_pending = None
         self.setup_ui()
+        subscribe_to_changes(self.on_database_changed)
+
+    def on_database_changed(self, changes):
+        """Refresh the association display if the color being shown was changed"""
+        current_hex = self.hex_code_label.cget("text").lower()
+        if any(c.hex.lower() == current_hex for c in changes):
+            self.display_association(current_hex)
+        elif any(c.kind in (UPSERTED, DELETED) for c in changes):
+            # Another color was described or removed; it may be one of the similar colors
+            self.schedule_similar_colors(current_hex)
 
     def setup_ui(self):
         container = tk.Frame(self.parent)
@@ -138,6 +155,10 @@ class ColorsTab:
         self.edit_link.bind("<Enter>", lambda e: self.edit_link.config(fg=hover_color))
         self.edit_link.bind("<Leave>", lambda e: self.edit_link.config(fg=normal_color))
 
+        # Described colors perceptually closest to the one shown
+        self.similar_frame = tk.Frame(self.parent)
+        self.similar_frame.pack(pady=(8, 0))
+
         # Initialize the association display for the default color
         self.display_association("#ffffff")  # white color hex code
 
@@ -153,8 +174,7 @@ class ColorsTab:
                 try:
                     self.color_display.config(bg=input_value)
                     self.hex_code_label.config(text=input_value, fg=normal_text_color)
-                    match = [name for name, val in mcolors.XKCD_COLORS.items() if val.lower() == input_value]
-                    name = match[0].replace("xkcd:", "") if match else "unknown"
+                    name = describe_color(input_value)
                     self.color_name_label.config(text=f"{name}", fg=normal_text_color)
                     self.display_association(input_value)
                 except tk.TclError:
@@ -164,15 +184,10 @@ class ColorsTab:
             color_name = input_value
             hex_code = None
 
-            if not color_name.startswith("xkcd:"):
-                color_name_xkcd = "xkcd:" + color_name
-            else:
-                color_name_xkcd = color_name
-
-            hex_code = mcolors.XKCD_COLORS.get(color_name_xkcd)
+            hex_code = get_xkcd_catalog().hex_for_name(color_name)
 
-            if not hex_code and color_name in mcolors.CSS4_COLORS:
-                hex_code = mcolors.CSS4_COLORS[color_name]
+            if not hex_code:
+                hex_code = get_css4_catalog().hex_for_name(color_name)
 
             if hex_code:
                 try:
@@ -188,8 +203,7 @@ class ColorsTab:
         current_hex = self.color_display["bg"].lower()
 
         if self.input_type.get() == "Color Name":
-            match = [name for name, val in mcolors.XKCD_COLORS.items() if val.lower() == current_hex]
-            color_name = match[0].replace("xkcd:", "") if match else "unknown"
+            color_name = get_xkcd_catalog().name_for_hex(current_hex)
             self.hex_entry.delete(0, tk.END)
             self.hex_entry.insert(0, color_name)
         else:
@@ -197,18 +211,14 @@ class ColorsTab:
             self.hex_entry.insert(0, current_hex)
 
     def display_association(self, hex_code):
-        db = load_database()
         saved_for_later = load_saved_for_later()
         
         # Get appropriate text colors for current system appearance
         normal_text_color, secondary_text_color = get_text_colors()
         
         # Check if color has an association
-        association = None
-        for entry in db:
-            if entry["hex"].lower() == hex_code.lower():
-                association = entry["associations"]
-                break
+        entry = get_association(hex_code)
+        association = entry["associations"] if entry else None
         
         # Check if color is saved for later
         is_saved_for_later = any(entry["hex"].lower() == hex_code.lower() for entry in saved_for_later)
@@ -251,6 +261,44 @@ class ColorsTab:
             self.write_one_link.pack(pady=(0, 0))
             self.save_later_link.pack(pady=(0, 0))
 
+        self.schedule_similar_colors(hex_code)
+
+    def schedule_similar_colors(self, hex_code):
+        # Deferred (and coalesced) so the lookup never delays the display
+        if self._similar_pending is not None:
+            self.parent.after_cancel(self._similar_pending)
+        self._similar_pending = self.parent.after_idle(self.show_similar_colors, hex_code)
+
+    def show_similar_colors(self, hex_code, k=5):
+        """Show the described colors perceptually closest to hex_code (by ΔE00) as clickable swatches"""
+        self._similar_pending = None
+        for widget in self.similar_frame.winfo_children():
+            widget.destroy()
+
+        similar = nearest_associations(hex_code, k, wait=False)
+        if similar is None:
+            # The color index is still being built in the background; no swatches until it is ready
+            self._similar_pending = self.parent.after(SIMILAR_RETRY_MS, self.show_similar_colors, hex_code, k)
+            return
+        if not similar:
+            return
+
+        _, secondary_text_color = get_text_colors()
+        tk.Label(self.similar_frame, text="Similar described colors:", font=("Arial", 10),
+                 fg=secondary_text_color).pack(side="left", padx=(0, 6))
+        for entry, delta_e in similar:
+            swatch = tk.Canvas(self.similar_frame, width=18, height=18, bg=entry["hex"],
+                               relief="solid", bd=1, cursor="hand2", highlightthickness=0)
+            swatch.pack(side="left", padx=2)
+            swatch.bind("<Button-1>", lambda e, hx=entry["hex"]: self.show_hex(hx))
+
+    def show_hex(self, hex_code):
+        """Load hex_code into the viewer"""
+        self.input_type.set("Hex Code")
+        self.hex_entry.delete(0, tk.END)
+        self.hex_entry.insert(0, hex_code)
+        self.update_color_display()
+
     def open_xkcd_browser(self):
         # Create popup window
         win = tk.Toplevel(self.parent)
@@ -273,47 +321,27 @@ class ColorsTab:
         query_entry = tk.Entry(top, textvariable=query_var, width=30)
         query_entry.pack(side="left", padx=(5, 0))
 
-        # Scrollable frame for colors
-        canvas = tk.Canvas(win)
-        vsb = tk.Scrollbar(win, orient="vertical", command=canvas.yview)
-        rows_frame = tk.Frame(canvas)
-
-        rows_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-
-        canvas.create_window((0, 0), window=rows_frame, anchor="nw")
-        canvas.configure(yscrollcommand=vsb.set)
-        canvas.pack(side="left", fill="both", expand=True)
-        vsb.pack(side="right", fill="y")
-
-        # Cross‑platform scrolling
-        setup_cross_platform_scrolling(canvas, rows_frame)
-
         # === NEW/UPDATED: sets for association + saved-for-later ===
         db = load_database()
         has_assoc_hex = {e["hex"].lower() for e in db if e.get("associations", "").strip()}
         saved_hex = {e["hex"].lower() for e in load_saved_for_later()}
 
         # === CHANGED: include has_assoc and is_saved flags in each row dict ===
-        all_rows = [{"name": n.replace("xkcd:", ""), "hex": hx,
-                    "has_assoc": (hx.lower() in has_assoc_hex),
-                    "is_saved": (hx.lower() in saved_hex)}
-                    for n, hx in mcolors.XKCD_COLORS.items()]
-        
-        # Sort by true rainbow order using the new function
-        all_rows = sort_colors_by_rainbow(all_rows)
+        # The catalog keeps the colors pre-sorted in rainbow order
+        all_rows = [{"name": c.name, "hex": c.hex,
+                    "has_assoc": (c.hex in has_assoc_hex),
+                    "is_saved": (c.hex in saved_hex)}
+                    for c in get_xkcd_catalog().rainbow_order]
 
         # --- header ---
-        hdr = tk.Frame(rows_frame)
+        hdr = tk.Frame(win)
         hdr.pack(fill="x", pady=(0, 4))
         tk.Label(hdr, text="Color", font=("Arial", 10, "bold"), width=6).pack(side="left", padx=(0, 4))
         tk.Label(hdr, text="Name", font=("Arial", 10, "bold"), width=16, anchor="w").pack(side="left")
         tk.Label(hdr, text="Hex", font=("Arial", 10, "bold"), width=10, anchor="w").pack(side="left", padx=(0))
         # === NEW: Status column header ===
         tk.Label(hdr, text="Status", font=("Arial", 10, "bold"), width=7, anchor="w").pack(side="left", padx=(6, 0))
-        ttk.Separator(rows_frame, orient="horizontal").pack(fill="x", pady=(0, 4))
+        ttk.Separator(win, orient="horizontal").pack(fill="x", pady=(0, 4))
 
         # --- selection handler -> fills Colors tab ---
         def choose(hx, nm):
@@ -323,71 +351,66 @@ class ColorsTab:
             self.update_color_display()
             win.destroy()
 
-        # --- table populate/filter ---
-        row_widgets = []
-        def populate(data):
-            for w in row_widgets:
-                w.destroy()
-            row_widgets.clear()
-
-            for e in data:
-                rf = tk.Frame(rows_frame)
-                rf.pack(fill="x", pady=0)
-
-                tk.Canvas(rf, width=20, height=20, bg=e["hex"], relief="solid", bd=1).pack(side="left", padx=(0, 4))
-                tk.Label(rf, text=e["name"], width=12, anchor="w").pack(side="left")
-                tk.Label(rf, text=e["hex"], width=7, anchor="w").pack(side="left", padx=(3, 0))
-
-                # === NEW: status indicators (✓ if association exists, S if saved for later) ===
-                status_text = ""
-                status_color = "black"
-                status_font = ("Arial", 17, "bold")  # default for ✓
-                if e.get("has_assoc"):
-                    status_text = "✓"
-                    status_color = "green"
-                elif e.get("is_saved"):
-                    status_text = "S"
-                    status_color = "#3d7afd"
-                    status_font = ("Arial", 16)
-
-                tk.Label(
-                    rf,
-                    text=status_text,
-                    width=7,
-                    anchor="w",
-                    fg=status_color,
-                    font=status_font
-                ).pack(side="left", padx=(6, 0))
-
-                def _on_click(ev=None, hx=e["hex"], nm=e["name"]):
-                    choose(hx, nm)
-                rf.bind("<Button-1>", _on_click)
-                for c in rf.winfo_children():
-                    c.bind("<Button-1>", _on_click)
+        # --- recyclable rows: only the rows in view exist as widgets ---
+        def create_row(parent):
+            rf = tk.Frame(parent)
+            rf.entry = None
+            rf.swatch = tk.Canvas(rf, width=20, height=20, relief="solid", bd=1)
+            rf.swatch.pack(side="left", padx=(0, 4))
+            rf.name_label = tk.Label(rf, width=12, anchor="w")
+            rf.name_label.pack(side="left")
+            rf.hex_label = tk.Label(rf, width=7, anchor="w")
+            rf.hex_label.pack(side="left", padx=(3, 0))
+            rf.status_label = tk.Label(rf, width=7, anchor="w")
+            rf.status_label.pack(side="left", padx=(6, 0))
+
+            def _on_click(ev=None):
+                if rf.entry is not None:
+                    choose(rf.entry["hex"], rf.entry["name"])
+            rf.bind("<Button-1>", _on_click)
+            for c in rf.winfo_children():
+                c.bind("<Button-1>", _on_click)
+            return rf
+
+        def update_row(rf, e):
+            rf.entry = e
+            rf.swatch.config(bg=e["hex"])
+            rf.name_label.config(text=e["name"])
+            rf.hex_label.config(text=e["hex"])
+
+            # === NEW: status indicators (✓ if association exists, S if saved for later) ===
+            status_text = ""
+            status_color = "black"
+            status_font = ("Arial", 17, "bold")  # default for ✓
+            if e.get("has_assoc"):
+                status_text = "✓"
+                status_color = "green"
+            elif e.get("is_saved"):
+                status_text = "S"
+                status_color = "#3d7afd"
+                status_font = ("Arial", 16)
+            rf.status_label.config(text=status_text, fg=status_color, font=status_font)
+
+        table_frame = tk.Frame(win)
+        table_frame.pack(fill="both", expand=True)
+        table = VirtualTable(table_frame, create_row, update_row, scrollbar_cls=tk.Scrollbar)
+        table.pack()
 
-                row_widgets.append(rf)
+        # Cross‑platform scrolling
+        setup_cross_platform_scrolling(table.canvas, table.canvas)
 
-        def do_filter(*_):
-            q = query_var.get().strip().lower()
-            if not q:
-                populate(all_rows)
-            else:
-                filtered = [e for e in all_rows if q in e["name"].lower() or q in e["hex"].lower()]
-                populate(filtered)
-            # Scroll to top after filtering
-            canvas.yview_moveto(0)
+        # --- table populate/filter: rows are swapped in place, never rebuilt ---
+        def show_results(results, query):
+            # set_rows scrolls back to the top after filtering
+            table.set_rows(results)
 
-        query_var.trace("w", do_filter)
-        populate(all_rows)
+        search = DebouncedSearch(win, query_var, color_row_matches, show_results)
+        search.set_items(all_rows)
 
     def add_association_popup(self, hex_code):
         # Check if association already exists
-        db = load_database()
-        existing_association = None
-        for entry in db:
-            if entry["hex"].lower() == hex_code.lower():
-                existing_association = entry["associations"]
-                break
+        existing_entry = get_association(hex_code)
+        existing_association = existing_entry["associations"] if existing_entry else None
         
         # Popup window
         popup = tk.Toplevel(self.parent)
@@ -402,9 +425,8 @@ class ColorsTab:
         y = (popup.winfo_screenheight() // 2) - 125 + 150
         popup.geometry(f"400x175+{x}+{y}")
 
-        # Color name lookup
-        xkcd_name = [name.replace("xkcd:", "") for name, val in mcolors.XKCD_COLORS.items() if val == hex_code]
-        name = xkcd_name[0] if xkcd_name else "unknown"
+        # Color name lookup (the closest named color for colors XKCD has no name for)
+        name = color_name_for_hex(hex_code)
 
         # Header
         tk.Label(popup, text=f"{name} ({hex_code})", font=("Arial", 12, "bold")).pack(pady=(10, 5))
@@ -426,11 +448,11 @@ class ColorsTab:
                     "xkcd_name": name,
                     "associations": assoc
                 }
+                # The change subscription refreshes the displayed association
                 save_to_database(entry)
                 # Remove from saved_for_later if it was there
                 remove_from_saved_for_later(hex_code)
                 popup.destroy()
-                self.update_color_display()  # Refresh the displayed association
             else:
                 messagebox.showerror("Error", "Association cannot be empty.")
 
@@ -441,8 +463,7 @@ class ColorsTab:
 
     def save_current_for_later(self, hex_code):
         """Save the current color for later without writing an association"""
-        xkcd_name = [name.replace("xkcd:", "") for name, val in mcolors.XKCD_COLORS.items() if val == hex_code]
-        name = xkcd_name[0] if xkcd_name else "unknown"
+        name = color_name_for_hex(hex_code)
         
         entry = {
             "hex": hex_code,
@@ -466,14 +487,11 @@ class ColorsTab:
         tk.Label(msg_win, text=f"'{name}' has been saved for later!", font=("Arial", 11)).pack(expand=True)
         tk.Button(msg_win, text="OK", command=msg_win.destroy).pack(pady=10)
         
-        # Auto-close after 2 seconds
+        # Auto-close after 2 seconds (the change subscription updates the association display)
         msg_win.after(2000, msg_win.destroy)
-        
-        # Update the association display to reflect the saved state
-        self.display_association(hex_code) 
 
     def open_saved_later_browser(self):
-        saved_colors = load_saved_for_later()
+        saved_colors = load_sorted_saved_for_later()
         if not saved_colors:
             messagebox.showinfo("No Saved Colors", "You have no colors saved for later.")
             return
@@ -527,9 +545,8 @@ class ColorsTab:
         setup_cross_platform_scrolling(canvas, rows_frame)
 
         # --- data prep (name, hex) ---
+        # Already in rainbow order
         all_rows = [{"name": c["xkcd_name"].replace("xkcd:", ""), "hex": c["hex"]} for c in saved_colors]
-        # Sort by true rainbow order using the new function
-        all_rows = sort_colors_by_rainbow(all_rows)
 
         # --- header ---
         hdr = tk.Frame(rows_frame)
@@ -585,22 +602,34 @@ class ColorsTab:
 
                 row_widgets.append(rf)
 
-        def do_filter(*_):
-            q = query_var.get().strip().lower()
-            if not q:
-                populate(all_rows)
-            else:
-                filtered = [e for e in all_rows if q in e["name"].lower() or q in e["hex"].lower()]
-                populate(filtered)
+        def show_results(results, query):
+            populate(results)
             # Scroll to top after filtering
             canvas.yview_moveto(0)
 
-        query_var.trace("w", do_filter)
-        populate(all_rows)
+        search = DebouncedSearch(win, query_var, color_row_matches, show_results)
+        search.set_items(all_rows)
 
         # keyboard niceties: Enter picks first visible, Esc closes
         def pick_first(_=None):
+            search.run_now()  # apply a search still waiting on its debounce
             if row_widgets:
                 row_widgets[0].event_generate("<Button-1>")
         win.bind("<Return>", pick_first)
-        win.bind("<Escape>", lambda e: win.destroy()) 
\ No newline at end of file
+        win.bind("<Escape>", lambda e: win.destroy())
+
+
+def describe_color(hex_code):
+    """XKCD name of hex_code, or "≈ name (ΔE n)" for the closest named color"""
+    name = get_xkcd_catalog().name_for_hex(hex_code, default=None)
+    if name is not None:
+        return name
+    match = nearest_named_color(hex_code)
+    if match.delta_e < EXACT_DELTA_E:
+        return match.name
+    return f"≈ {match.name} (ΔE {match.delta_e:.1f})"
+
+
+def color_row_matches(row, query):
+    """Search predicate for the color browsers (query is already lowercased)"""
+    return query in row["name"].lower() or query in row["hex"].lower()
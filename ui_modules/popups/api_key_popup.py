@@ -3,6 +3,7 @@ from tkinter import messagebox
 import os
 import webbrowser
 from utils import get_link_colors
+from gemini_backend import reload_config
 
 
 class APIKeyPopup:
@@ -99,6 +100,8 @@ class APIKeyPopup:
         try:
             with open(".env", "w") as f:
                 f.write(f"GOOGLE_GENERATIVE_AI_API_KEY={api_key}\n")
+            # The backend reads its configuration once; have it pick up the new key
+            reload_config()
             messagebox.showinfo("Success", "API key saved successfully!")
             self.popup.destroy()
             if self.refresh_callback:
@@ -0,0 +1,110 @@
+class DebouncedSearch:
+    """
+    Debounced, incremental filter for a search box.
+
+    Typing schedules a search on the Tk `after` loop `delay` ms after the last
+    keystroke. When the new query extends the previous one, only the previous
+    results are re-checked instead of the full item list. Long scans run in
+    chunks between Tk events and are abandoned as soon as a newer query arrives.
+
+    matches(item, query) is called with the lowercased, stripped query and must
+    be a substring-style predicate (anything matching "abc" also matches "ab").
+    on_results(results, query) receives the matching items in their original order.
+
+    Alternatively pass search(query) -> results to answer queries from an index;
+    the search is then debounced but not scanned or narrowed here.
+    """
+
+    def __init__(self, widget, variable, matches, on_results, delay=150, chunk_size=5000, search=None):
+        self.widget = widget
+        self.variable = variable
+        self.matches = matches
+        self.search = search
+        self.on_results = on_results
+        self.delay = delay
+        self.chunk_size = chunk_size
+
+        self.items = []
+        self._generation = 0
+        self._pending = None
+        self._last_query = None
+        self._last_results = None
+
+        variable.trace_add("write", self._on_change)
+
+    def query(self):
+        return self.variable.get().strip().lower()
+
+    def set_items(self, items):
+        """Replace the searchable items and re-run the current query right away"""
+        self.items = list(items)
+        self._last_query = None
+        self._last_results = None
+        self.run_now()
+
+    def update_items(self, items):
+        """Replace the searchable items without re-running the current query (its results were patched by the caller)"""
+        self.items = list(items)
+        self._last_query = None
+        self._last_results = None
+
+    def run_now(self):
+        """Cancel any scheduled search and run the current query immediately"""
+        self._cancel_pending()
+        self._generation += 1
+        query = self.query()
+        if self.search is not None and query:
+            results = self.search(query)
+        else:
+            results = [item for item in self._candidates(query) if not query or self.matches(item, query)]
+        self._finish(query, results)
+
+    def _on_change(self, *_):
+        self._cancel_pending()
+        # A newer keystroke makes any search still in progress stale
+        self._generation += 1
+        self._pending = self.widget.after(self.delay, self._start)
+
+    def _cancel_pending(self):
+        if self._pending is not None:
+            try:
+                self.widget.after_cancel(self._pending)
+            except Exception:
+                pass
+            self._pending = None
+
+    def _candidates(self, query):
+        # Narrow the previous results when the query only grew
+        if (self._last_results is not None and self._last_query
+                and query.startswith(self._last_query)):
+            return self._last_results
+        return self.items
+
+    def _start(self):
+        self._pending = None
+        query = self.query()
+        if query == self._last_query:
+            return
+        if not query:
+            self._finish(query, list(self.items))
+            return
+        if self.search is not None:
+            self._finish(query, self.search(query))
+            return
+        self._scan(self._generation, query, self._candidates(query), 0, [])
+
+    def _scan(self, generation, query, candidates, start, results):
+        if generation != self._generation or not self.widget.winfo_exists():
+            return  # superseded by a newer keystroke
+        end = start + self.chunk_size
+        results.extend(item for item in candidates[start:end] if self.matches(item, query))
+        if end < len(candidates):
+            self._pending = self.widget.after(1, self._scan, generation, query, candidates, end, results)
+        else:
+            self._pending = None
+            self._finish(query, results)
+
+    def _finish(self, query, results):
+        self._last_query = query
+        self._last_results = results
+        self.on_results(results, query)
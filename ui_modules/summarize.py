@@ -1,15 +1,25 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import os
-from gemini_backend import update_summary_file, has_api_key
+from typing import Optional
+from assistant import get_summarizer, stream_summary_text, write_summary_file
+from gemini_backend import get_backend
+from llm_backend import LLMBackend
 from utils import load_database, ASCII_ART, setup_cross_platform_scrolling, get_link_colors
 from ui_modules.popups.api_key_popup import APIKeyPopup
+from ui_modules.background import BackgroundRunner, BusyIndicator
 
 
 class SummarizeTab:
-    def __init__(self, parent, refresh_all_callback=None):
+    def __init__(self, parent, refresh_all_callback=None, backend: Optional[LLMBackend] = None):
         self.parent = parent
         self.refresh_all_callback = refresh_all_callback
+        # Any LLMBackend (e.g. fake_backend.FakeBackend); Gemini by default
+        self.backend = backend or get_backend()
+        self.runner = BackgroundRunner(parent)
+        self._task = None
+        # Text of the summary being streamed in (None when none is running)
+        self._partial_summary = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -17,14 +27,17 @@ class SummarizeTab:
             widget.destroy()
 
         # Check if API key is available
-        if not has_api_key():
+        if not self.backend.has_api_key():
             self.show_api_key_message()
             return
 
         summary_path = "db/summary.txt"
-        if os.path.exists(summary_path):
-            with open(summary_path, "r", encoding="utf-8") as f:
-                summary_text = f.read()
+        if self._partial_summary is not None or os.path.exists(summary_path):
+            if self._partial_summary is not None:
+                summary_text = self._partial_summary
+            else:
+                with open(summary_path, "r", encoding="utf-8") as f:
+                    summary_text = f.read()
 
             # Create a container frame to center the content
             container_frame = tk.Frame(self.parent)
@@ -37,7 +50,7 @@ class SummarizeTab:
             frame.columnconfigure(0, weight=1)
 
             # Create text widget with maximum width constraint
-            text_widget = tk.Text(frame, wrap="word", width=80)  # Set a reasonable max width
+            text_widget = self.summary_text_widget = tk.Text(frame, wrap="word", width=80)  # Set a reasonable max width
             text_widget.insert("1.0", ASCII_ART + "\n" + summary_text)
             text_widget.config(state="disabled")
             text_widget.grid(row=0, column=0, sticky="nsew")
@@ -53,15 +66,28 @@ class SummarizeTab:
             button_frame = tk.Frame(container_frame)
             button_frame.pack(pady=(5, 10))
             
-            update_button = tk.Button(button_frame, text="New Summary", command=self.update_summary)
-            update_button.pack(side="left", padx=(0, 5))
+            self.summary_button = tk.Button(button_frame, text="New Summary", command=self.update_summary)
+            self.summary_button.pack(side="left", padx=(0, 5))
             
             export_summary_button = tk.Button(button_frame, text="Save as .txt", command=self.export_summary)
             export_summary_button.pack(side="left", padx=(5, 0))
+
+            status = self.format_last_run()
+            if status:
+                tk.Label(container_frame, text=status, font=("Arial", 10), fg="gray").pack(pady=(0, 5))
+
+            self.busy_indicator = BusyIndicator(container_frame, "Generating summary…", self.cancel_summary)
+            self.busy_anchor = button_frame
         else:
             tk.Label(self.parent, text="No summary found.", font=("Arial", 12)).pack(pady=20)
-            generate_button = tk.Button(self.parent, text="Generate Summary", command=self.update_summary)
-            generate_button.pack(pady=5)
+            self.summary_button = tk.Button(self.parent, text="Generate Summary", command=self.update_summary)
+            self.summary_button.pack(pady=5)
+
+            self.busy_indicator = BusyIndicator(self.parent, "Generating summary…", self.cancel_summary)
+            self.busy_anchor = self.summary_button
+
+        # Keep showing a summary that was started before the tab was rebuilt
+        self.set_busy(self._task is not None)
 
     def show_api_key_message(self):
         """Display message when API key is missing"""
@@ -102,12 +128,78 @@ class SummarizeTab:
             messagebox.showinfo("Summary", "Database is empty.")
             return
 
+        if self._task is not None:
+            return
+
+        # The summary streams in on a worker thread, so the window stays
+        # responsive and text appears as soon as the first chunk arrives; the
+        # file is only written once it is complete (and not if cancelled)
+        self._task = self.runner.stream(
+            stream_summary_text, self.backend, db,
+            on_chunk=self.append_summary,
+            on_success=self.save_summary,
+            on_error=self.summary_failed,
+            on_finish=self.finish_summary,
+        )
+        self._partial_summary = ""
+        self.setup_ui()
+
+    def append_summary(self, text):
+        self._partial_summary += text
+        if self.summary_text_widget.winfo_exists():
+            self.summary_text_widget.config(state="normal")
+            self.summary_text_widget.insert(tk.END, text)
+            self.summary_text_widget.config(state="disabled")
+
+    def format_last_run(self):
+        """One status line with the families redone and per-stage timings of the last summary, if any"""
+        last_run = get_summarizer(self.backend).last_run
+        if not last_run or self._task is not None:
+            return ""
+        parts = [f"{len(last_run['regenerated'])} families regenerated, {len(last_run['reused'])} reused"]
+        for stage, timing in last_run["stages"].items():
+            calls = timing["calls"]
+            parts.append(f"{stage}: {calls} call{'s' if calls != 1 else ''} in {timing['seconds']:.1f}s")
+        parts.append(f"total {last_run['seconds']:.1f}s")
+        return "Last summary: " + " · ".join(parts)
+
+    def save_summary(self, summary):
         try:
-            update_summary_file(db)
-            messagebox.showinfo("Summary", "Summary updated!\n NOTE: Quality will improve as more data is collected.")
-            self.setup_ui()
+            write_summary_file(summary)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate summary: {str(e)}")
+            messagebox.showerror("Error", f"Failed to save summary: {str(e)}")
+            return
+        messagebox.showinfo("Summary", "Summary updated!\n NOTE: Quality will improve as more data is collected.")
+
+    def summary_failed(self, error):
+        # Put the previous summary back
+        self._partial_summary = None
+        self.setup_ui()
+        messagebox.showerror("Error", f"Failed to generate summary: {str(error)}")
+
+    def cancel_summary(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._task = None
+        self._partial_summary = None
+        self.setup_ui()
+
+    def finish_summary(self):
+        self._task = None
+        self._partial_summary = None
+        # Rebuilt rather than just un-busied, to show the run's timings
+        self.setup_ui()
+
+    def set_busy(self, busy):
+        # The tab may have been rebuilt (or show the API key message) meanwhile
+        button = getattr(self, "summary_button", None)
+        if button is None or not button.winfo_exists():
+            return
+        button.config(state="disabled" if busy else "normal")
+        if busy:
+            self.busy_indicator.show(after=self.busy_anchor, pady=(0, 10))
+        else:
+            self.busy_indicator.hide()
 
     def export_summary(self):
         summary_path = "db/summary.txt"
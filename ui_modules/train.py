@@ -1,12 +1,10 @@
 import tkinter as tk
 from tkinter import messagebox
 import random
-from matplotlib import colors as mcolors
 from key_bindings import apply_text_navigation_bindings, bind_enter_to_submit
-from utils import load_database, save_to_database, save_to_saved_for_later, remove_from_saved_for_later
-
-# Generate color list from XKCD
-XKCD_COLORS = list(mcolors.XKCD_COLORS.values())
+from color_catalog import get_xkcd_catalog
+from color_index import color_name_for_hex
+from utils import load_database, save_to_database, save_to_saved_for_later, remove_from_saved_for_later, count_associations, subscribe_to_changes, UPSERTED, DELETED
 
 
 class TrainTab:
@@ -14,6 +12,7 @@ class TrainTab:
         self.parent = parent
         self.current_color = "#ffffff"  # placeholder so widgets render
         self.setup_ui()
+        subscribe_to_changes(self.on_database_changed)
 
     def setup_ui(self):
         # Create main container frame
@@ -54,7 +53,7 @@ class TrainTab:
         self.save_later_button.pack(side="left")
 
         # Bottom section with count (outside the centered content)
-        self.color_count_label = tk.Label(self.parent, text=f"Colors described: {len(load_database())}")
+        self.color_count_label = tk.Label(self.parent, text=f"Colors described: {count_associations()}")
         self.color_count_label.pack(side="bottom", pady=(0, 10))
 
         # Immediately load an untrained color
@@ -66,10 +65,9 @@ class TrainTab:
         # Save current if user wrote something
         if assoc:
             hex_code = self.current_color
-            xkcd_name = [name.replace("xkcd:", "") for name, hx in mcolors.XKCD_COLORS.items() if hx == hex_code]
             entry = {
                 "hex": hex_code,
-                "xkcd_name": xkcd_name[0] if xkcd_name else "unknown",
+                "xkcd_name": color_name_for_hex(hex_code),
                 "associations": assoc
             }
             save_to_database(entry)
@@ -79,7 +77,8 @@ class TrainTab:
         # Filter to only colors with NO association yet
         db = load_database()
         used = {e["hex"].lower() for e in db}
-        candidates = [c for c in XKCD_COLORS if c.lower() not in used]
+        # The XKCD palette is parsed on first use, not when the module is imported
+        candidates = [c for c in get_xkcd_catalog().hexes() if c.lower() not in used]
 
         if not candidates:
             messagebox.showinfo("Done", "All colors have been described!")
@@ -92,13 +91,17 @@ class TrainTab:
         self.synesth_entry.delete("1.0", tk.END)
         self.color_count_label.config(text=f"Colors described: {len(db)}") 
 
+    def on_database_changed(self, changes):
+        """Keep the described-colors counter in sync with the database"""
+        if any(c.kind in (UPSERTED, DELETED) for c in changes):
+            self.color_count_label.config(text=f"Colors described: {count_associations()}")
+
     def saved_for_later(self):
         """Save the current color for later without writing an association"""
         hex_code = self.current_color
-        xkcd_name = [name.replace("xkcd:", "") for name, hx in mcolors.XKCD_COLORS.items() if hx == hex_code]
         entry = {
             "hex": hex_code,
-            "xkcd_name": xkcd_name[0] if xkcd_name else "unknown"
+            "xkcd_name": color_name_for_hex(hex_code)
         }
         save_to_saved_for_later(entry)
         self.next_color() 
\ No newline at end of file
@@ -0,0 +1,178 @@
+import tkinter as tk
+from tkinter import ttk
+
+# Pooled rows that are not in use are parked above the scroll region
+_PARKED_Y = -10000
+
+
+class VirtualTable:
+    """
+    Scrollable table that only creates widgets for the rows in view.
+
+    Rows are fixed-height frames placed as canvas windows. A small pool of row
+    widgets (visible rows plus `overscan` on each side) is created on demand
+    and re-filled with different data as the user scrolls, so rendering cost
+    depends on the viewport size rather than on the number of rows.
+
+    create_row(parent) must build and return an (unpacked) row widget;
+    update_row(row_widget, data) fills it with one row's data. With key(data)
+    given, single rows can be found by key (index_of) and patched in place
+    (replace_row, insert_row, remove_row) instead of replacing every row.
+    """
+
+    def __init__(self, parent, create_row, update_row, row_height=None, overscan=4,
+                 empty_text="", scrollbar_cls=ttk.Scrollbar, key=None, **canvas_options):
+        self.create_row = create_row
+        self.update_row = update_row
+        self.key = key
+        self.row_height = row_height
+        self.overscan = overscan
+        self.empty_text = empty_text
+
+        self.canvas = tk.Canvas(parent, **canvas_options)
+        self.scrollbar = scrollbar_cls(parent, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
+        self.canvas.bind("<Configure>", self._on_configure)
+
+        self.rows = []
+        self._keys = []  # key(row) for each row, when a key function is given
+        self._pool = []  # [(row_widget, window_id)]
+        self._slot_state = []  # (row index, row data) currently shown in each pool slot
+        self._render_pending = None
+        self._empty_item = None
+
+    # ---------- Layout ----------
+
+    def pack(self, **options):
+        """Pack the canvas and its scrollbar side by side"""
+        self.canvas.pack(side="left", fill="both", expand=True, **options)
+        self.scrollbar.pack(side="right", fill="y")
+
+    # ---------- Data ----------
+
+    def set_rows(self, rows, keep_position=False):
+        """Replace the table's rows; widgets already on screen are reused in place"""
+        self.rows = list(rows)
+        if self.key is not None:
+            self._keys = [self.key(row) for row in self.rows]
+        if not keep_position:
+            self.canvas.yview_moveto(0)
+        self._update_scrollregion()
+        self._render()
+
+    def index_of(self, key):
+        """Index of the row with the given key, or None"""
+        try:
+            return self._keys.index(key)
+        except ValueError:
+            return None
+
+    def replace_row(self, index, data):
+        self.rows[index] = data
+        self._schedule_render()
+
+    def insert_row(self, index, data):
+        self.rows.insert(index, data)
+        self._keys.insert(index, self.key(data))
+        self._update_scrollregion()
+        self._schedule_render()
+
+    def remove_row(self, index):
+        del self.rows[index]
+        del self._keys[index]
+        self._update_scrollregion()
+        self._schedule_render()
+
+    def scroll_to_top(self):
+        self.canvas.yview_moveto(0)
+
+    def visible_rows(self):
+        """Return the data for the rows currently rendered in the viewport"""
+        first, last = self._visible_range(overscan=0)
+        return self.rows[first:last]
+
+    # ---------- Rendering ----------
+
+    def _measure_row_height(self):
+        row_widget, window_id = self._new_pool_row()
+        if self.rows:
+            self.update_row(row_widget, self.rows[0])
+        row_widget.update_idletasks()
+        self.row_height = max(row_widget.winfo_reqheight(), 1)
+
+    def _new_pool_row(self):
+        row_widget = self.create_row(self.canvas)
+        window_id = self.canvas.create_window(
+            0, _PARKED_Y, window=row_widget, anchor="nw", width=self.canvas.winfo_width()
+        )
+        self._pool.append((row_widget, window_id))
+        self._slot_state.append(None)
+        return row_widget, window_id
+
+    def _update_scrollregion(self):
+        if self.row_height is None and self.rows:
+            self._measure_row_height()
+        height = len(self.rows) * (self.row_height or 0)
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), height))
+
+    def _visible_range(self, overscan=None):
+        if not self.rows or not self.row_height:
+            return 0, 0
+        if overscan is None:
+            overscan = self.overscan
+        top = self.canvas.canvasy(0)
+        height = max(self.canvas.winfo_height(), self.row_height)
+        first = max(int(top // self.row_height) - overscan, 0)
+        last = min(int((top + height) // self.row_height) + 1 + overscan, len(self.rows))
+        return first, last
+
+    def _render(self):
+        self._render_pending = None
+        if not self.canvas.winfo_exists():
+            return
+
+        if self._empty_item is not None:
+            self.canvas.delete(self._empty_item)
+            self._empty_item = None
+        if not self.rows and self.empty_text:
+            self._empty_item = self.canvas.create_text(
+                self.canvas.winfo_width() // 2, 30, text=self.empty_text, font=("Arial", 12)
+            )
+
+        first, last = self._visible_range()
+        while len(self._pool) < last - first:
+            self._new_pool_row()
+
+        # Row i always lives in slot i % pool size, so scrolling by one row only
+        # re-fills the one slot that wrapped around
+        shown = set()
+        for index in range(first, last):
+            slot = index % len(self._pool)
+            shown.add(slot)
+            data = self.rows[index]
+            state = self._slot_state[slot]
+            if state is not None and state[0] == index and state[1] is data:
+                continue
+            row_widget, window_id = self._pool[slot]
+            self.update_row(row_widget, data)
+            self.canvas.coords(window_id, 0, index * self.row_height)
+            self._slot_state[slot] = (index, data)
+
+        for slot, (row_widget, window_id) in enumerate(self._pool):
+            if slot not in shown and self._slot_state[slot] is not None:
+                self.canvas.coords(window_id, 0, _PARKED_Y)
+                self._slot_state[slot] = None
+
+    def _schedule_render(self):
+        if self._render_pending is None:
+            self._render_pending = self.canvas.after_idle(self._render)
+
+    def _on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._schedule_render()
+
+    def _on_configure(self, event):
+        for _, window_id in self._pool:
+            self.canvas.itemconfigure(window_id, width=event.width)
+        self._update_scrollregion()
+        self._schedule_render()
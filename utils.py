@@ -1,14 +1,65 @@
-import json
+import atexit
 import os
 import tkinter as tk
 import colorsys
 import platform
+import re
 import subprocess
 import sys
+import threading
+from collections import namedtuple
+from functools import lru_cache
 
-# Global callback for database updates
+from association_store import (
+    AssociationStore, AssociationRepository, JsonListStore, WriteBehindFlusher, STORE_PATH
+)
+from search_index import AssociationIndex, tokenize
+
+# ---------- Database change events ----------
+
+# Change kinds published to subscribers
+UPSERTED = "upserted"
+DELETED = "deleted"
+SAVED_FOR_LATER_CHANGED = "saved_for_later_changed"
+
+DatabaseChange = namedtuple("DatabaseChange", ["kind", "hex"])
+
+_change_subscribers = []
+
+# Global callback for database updates (kept for callers that only need "something changed")
 _database_update_callback = None
 
+
+def subscribe_to_changes(callback):
+    """
+    Subscribe to database changes.
+
+    callback(changes) receives a list of DatabaseChange(kind, hex) tuples; a
+    bulk operation publishes one list for the whole batch.
+    Returns a function that unsubscribes the callback.
+    """
+    _change_subscribers.append(callback)
+
+    def unsubscribe():
+        if callback in _change_subscribers:
+            _change_subscribers.remove(callback)
+    return unsubscribe
+
+
+def publish_changes(changes):
+    """Notify subscribers (and the legacy update callback) of a batch of changes"""
+    changes = list(changes)
+    if not changes:
+        return
+    # Shared indexes are patched first so subscribers can query them
+    _update_shared_indexes(changes)
+    for callback in list(_change_subscribers):
+        callback(changes)
+
+    callback = get_database_update_callback()
+    if callback:
+        callback()
+
 def set_database_update_callback(callback):
     """Set a callback function to be called when the database is updated"""
     global _database_update_callback
@@ -19,7 +70,7 @@ def get_database_update_callback():
     return _database_update_callback
 
 # Database paths
-DB_PATH = "db/associations.json"
+DB_PATH = STORE_PATH
 saved_for_later_PATH = "db/saved_for_later.json"
 
 
@@ -92,6 +143,28 @@ def get_text_colors():
 
 # ---------- Color utilities ----------
 
+# Rainbow sort parameters, shared with the vectorized engine in rainbow_sort.py
+RAINBOW_BAND_CENTERS = (330, 0, 30, 60, 90, 120, 150, 180, 210, 240, 270, 300)
+GREY_THRESHOLD = 0.15
+PALE_THRESHOLD = 0.3
+
+# Names of the color families: one per band center, then the greys
+RAINBOW_FAMILY_NAMES = (
+    "pinks", "reds", "oranges", "yellows", "yellow-greens", "greens",
+    "blue-greens", "cyans", "sky blues", "blues", "purples", "magentas",
+)
+NEUTRAL_FAMILY = "neutrals"
+COLOR_FAMILIES = RAINBOW_FAMILY_NAMES + (NEUTRAL_FAMILY,)
+
+# Sort keys depend only on the hex code, so they are computed once per color
+SORT_KEY_CACHE_SIZE = 1 << 17
+
+
+def srgb_to_linear(c: float) -> float:
+    """Linearize one sRGB channel in [0, 1]"""
+    return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+
+
 def relative_luminance(hex_color: str) -> float:
     """
     Compute perceptual lightness Y from linearized sRGB.
@@ -102,14 +175,36 @@ def relative_luminance(hex_color: str) -> float:
     g = int(h[2:4], 16) / 255.0
     b = int(h[4:6], 16) / 255.0
 
-    def to_linear(c: float) -> float:
-        return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
-
-    R, G, B = map(to_linear, (r, g, b))
+    R, G, B = map(srgb_to_linear, (r, g, b))
     # Relative luminance per ITU-R BT.709
     return 0.2126 * R + 0.7152 * G + 0.0722 * B
 
 
+# D65 reference white, for CIELAB
+_WHITE_X, _WHITE_Y, _WHITE_Z = 0.95047, 1.0, 1.08883
+
+
+def hex_to_lab(hex_color):
+    """
+    Convert hex color to CIELAB (D65).
+    Returns (L, a, b) with L in [0, 100]; Euclidean distance between two
+    results is the CIE76 color difference ΔE*ab.
+    """
+    h = hex_color.lstrip("#")
+    R, G, B = (srgb_to_linear(int(h[i:i + 2], 16) / 255.0) for i in (0, 2, 4))
+
+    # Linear sRGB → XYZ, normalized by the white point
+    x = (0.4124564 * R + 0.3575761 * G + 0.1804375 * B) / _WHITE_X
+    y = (0.2126729 * R + 0.7151522 * G + 0.0721750 * B) / _WHITE_Y
+    z = (0.0193339 * R + 0.1191920 * G + 0.9503041 * B) / _WHITE_Z
+
+    def f(t: float) -> float:
+        return t ** (1 / 3) if t > 216 / 24389 else (24389 / 27 * t + 16) / 116
+
+    fx, fy, fz = f(x), f(y), f(z)
+    return 116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz)
+
+
 def hex_to_hsv(hex_color):
     """
     Convert hex color to HSV values.
@@ -123,6 +218,7 @@ def hex_to_hsv(hex_color):
     return h * 360.0, s, v
 
 
+@lru_cache(maxsize=SORT_KEY_CACHE_SIZE)
 def get_color_sort_key(hex_color: str, snap_pale: bool = False):
     """
     Sort key for 12-family alternating lightness direction wheel.
@@ -141,14 +237,14 @@ def get_color_sort_key(hex_color: str, snap_pale: bool = False):
     lum = relative_luminance(hex_color)
     
     # Handle greys (low saturation)
-    GREY_THRESHOLD = 0.15
     if sat < GREY_THRESHOLD:
         return (1, 0, lum, hue)  # greys go to the end, sorted by luminance
     
+    band_centers = RAINBOW_BAND_CENTERS
+
     # Optional: snap pale colors toward their band center
-    if snap_pale and sat < 0.3:
+    if snap_pale and sat < PALE_THRESHOLD:
         # Find nearest band center and slightly pull hue toward it
-        band_centers = [330, 0, 30, 60, 90, 120, 150, 180, 210, 240, 270, 300]
         distances = [min(abs(hue - center), abs(hue - center + 360), abs(hue - center - 360)) 
                     for center in band_centers]
         nearest_band = distances.index(min(distances))
@@ -164,7 +260,6 @@ def get_color_sort_key(hex_color: str, snap_pale: bool = False):
         hue = hue % 360
     
     # Find nearest band center
-    band_centers = [330, 0, 30, 60, 90, 120, 150, 180, 210, 240, 270, 300]
     distances = [min(abs(hue - center), abs(hue - center + 360), abs(hue - center - 360)) 
                 for center in band_centers]
     band_index = distances.index(min(distances))
@@ -179,6 +274,12 @@ def get_color_sort_key(hex_color: str, snap_pale: bool = False):
     return (0, band_index, luminance_key, hue)
 
 
+def get_color_family(hex_color: str) -> str:
+    """Name of the color family (rainbow band, or neutrals for greys) hex_color sorts into"""
+    is_grey, band_index, _, _ = get_color_sort_key(hex_color)
+    return NEUTRAL_FAMILY if is_grey else RAINBOW_FAMILY_NAMES[band_index]
+
+
 def sort_colors_by_rainbow(color_list, hex_key: str = 'hex', snap_pale: bool = False):
     """
     Sort a list of color dictionaries by 12-family alternating lightness direction wheel.
@@ -200,100 +301,319 @@ def sort_colors_by_rainbow(color_list, hex_key: str = 'hex', snap_pale: bool = F
     -------
     list[dict] : sorted copy of color_list
     """
-    return sorted(
-        color_list,
-        key=lambda x: get_color_sort_key(x[hex_key], snap_pale=snap_pale)
-    )
+    from rainbow_sort import rainbow_argsort
+
+    color_list = list(color_list)
+    order = rainbow_argsort([x[hex_key] for x in color_list], snap_pale=snap_pale)
+    return [color_list[i] for i in order]
 
 
 # ---------- Database helpers ----------
 
+_association_repository = None
+_saved_for_later_store = None
+_search_index = None
+# Held while a shared index is built (possibly on a background thread) or patched
+_shared_index_lock = threading.Lock()
+_color_index_warming = False
+_rainbow_view = None
+_color_index = None
+_saved_for_later_view = None
+_write_behind_flusher = None
+
+
+def get_write_behind_flusher():
+    """Return the shared write-behind flusher thread, starting it on first use"""
+    global _write_behind_flusher
+    if _write_behind_flusher is None:
+        _write_behind_flusher = WriteBehindFlusher()
+        _write_behind_flusher.start()
+        atexit.register(_close_database_at_exit)
+    return _write_behind_flusher
+
+
+def get_association_repository():
+    """Return the shared, cached association repository, opening the store on first use"""
+    global _association_repository
+    if _association_repository is None:
+        store = AssociationStore(DB_PATH)
+        store.start_compactor()
+        _association_repository = AssociationRepository(store, flusher=get_write_behind_flusher())
+    return _association_repository
+
+
+def get_saved_for_later_store():
+    """Return the shared in-memory saved-for-later list"""
+    global _saved_for_later_store
+    if _saved_for_later_store is None:
+        _saved_for_later_store = JsonListStore(saved_for_later_PATH, flusher=get_write_behind_flusher())
+    return _saved_for_later_store
+
+
+def flush_database():
+    """Write all pending association and saved-for-later changes to disk now"""
+    if _write_behind_flusher is not None:
+        _write_behind_flusher.flush()
+
+
+def close_database():
+    """
+    Flush pending changes, stop background threads and close the store (call on exit).
+
+    Raises if pending changes still cannot be written after the flusher's
+    retries; the store is closed either way.
+    """
+    global _write_behind_flusher, _association_repository
+    try:
+        if _write_behind_flusher is not None:
+            flusher, _write_behind_flusher = _write_behind_flusher, None
+            flusher.stop()
+    finally:
+        if _association_repository is not None:
+            _association_repository.store.close()
+            _association_repository = None
+
+
+def _close_database_at_exit():
+    # Nothing is left to tell the user at this point, so a failure is logged rather than raised
+    try:
+        close_database()
+    except Exception as e:
+        print(f"Could not write unsaved changes on exit: {e}", file=sys.stderr)
+
+
 def load_database():
-    """Load the associations database from JSON file"""
-    if os.path.exists(DB_PATH):
-        try:
-            with open(DB_PATH, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    return []
-                return json.loads(content)
-        except json.JSONDecodeError:
-            return []
-    elif os.path.exists("db/associations_backup.json"):
+    """Load all associations from the database"""
+    return get_association_repository().all()
+
+
+def count_associations():
+    """Return the number of associations in the database"""
+    return len(get_association_repository())
+
+
+def get_search_index():
+    """Return the shared full-text index over associations, building it on first use"""
+    global _search_index
+    with _shared_index_lock:
+        if _search_index is None:
+            _search_index = AssociationIndex(load_database())
+        return _search_index
+
+
+def association_term_scores(tokens):
+    """
+    {hex: BM25 score} of the associations containing any of tokens (see
+    AssociationIndex.term_scores), from the shared index; safe to call off
+    the Tk thread, which patches the index as entries change
+    """
+    index = get_search_index()
+    with _shared_index_lock:
+        return index.term_scores(tokens)
+
+
+def warm_search_index():
+    """Build the shared search index on a background thread, so the first search doesn't wait for it"""
+    threading.Thread(target=get_search_index, name="search-index-build", daemon=True).start()
+
+
+# "near:#3c0008" or "near:#3c0008:15" finds colors within a ΔE of a color
+_NEAR_QUERY_RE = re.compile(r"near:(#?[0-9a-f]{6})(?::(\d+(?:\.\d+)?))?", re.IGNORECASE)
+DEFAULT_NEAR_DELTA_E = 10.0
+
+
+def search_associations(query, limit=None):
+    """
+    Return associations matching query (terms, prefixes, "phrases"), best match first.
+
+    A query of the form near:#rrggbb[:ΔE] instead returns the associations
+    whose colors are within ΔE (CIEDE2000, default 10) of that color, closest first.
+    """
+    near = _NEAR_QUERY_RE.fullmatch(query.strip())
+    if near:
+        hex_code = "#" + near.group(1).lstrip("#")
+        max_delta_e = float(near.group(2)) if near.group(2) else DEFAULT_NEAR_DELTA_E
+        entries = [entry for entry, _ in associations_within(hex_code, max_delta_e)]
+        return entries[:limit] if limit is not None else entries
+    if not tokenize(query):
+        # Nothing to rank by (e.g. just "#"): every entry, in the usual rainbow order
+        entries = load_sorted_database()
+        return entries[:limit] if limit is not None else entries
+    return get_search_index().search(query, limit=limit)
+
+
+def associations_within(hex_code, max_delta_e=DEFAULT_NEAR_DELTA_E):
+    """Return (entry, delta_e) pairs for associations within max_delta_e (CIEDE2000) of hex_code, closest first"""
+    from color_distance import within
+    return within(hex_code, load_database(), max_delta_e)
+
+
+def get_rainbow_view():
+    """Return the shared rainbow-ordered view of the associations, sorting it on first use"""
+    global _rainbow_view
+    if _rainbow_view is None:
+        from rainbow_sort import RainbowSortedList
+        _rainbow_view = RainbowSortedList(load_database())
+    return _rainbow_view
+
+
+def load_sorted_database():
+    """Load all associations in rainbow order (kept sorted as entries change, not re-sorted)"""
+    return get_rainbow_view().entries()
+
+
+def get_association_color_index():
+    """Return the shared nearest-color index over associations, building it on first use"""
+    global _color_index
+    with _shared_index_lock:
+        if _color_index is None:
+            from color_index import NearestColorIndex
+            _color_index = NearestColorIndex((e["hex"], e) for e in load_database())
+        return _color_index
+
+
+def warm_association_color_index():
+    """Build the shared nearest-color index on a background thread (no-op if it is built or being built)"""
+    global _color_index_warming
+    if _color_index is not None or _color_index_warming:
+        return
+    _color_index_warming = True
+
+    def build():
+        global _color_index_warming
         try:
-            with open("db/associations_backup.json", "r") as f:
-                content = f.read().strip()
-                if not content:
-                    return []
-                return json.loads(content)
-        except json.JSONDecodeError:
-            return []
-    return []
+            get_association_color_index()
+        finally:
+            _color_index_warming = False
+
+    threading.Thread(target=build, name="color-index-build", daemon=True).start()
+
+
+# Nearest colors are found by CIE76 (the index's metric) and then re-ranked by
+# CIEDE2000, the metric of near: searches; this many candidates per result
+SIMILAR_OVERSAMPLE = 4
+
+
+def nearest_associations(hex_code, k=5, wait=True):
+    """
+    Return up to k (entry, ΔE00) pairs for the described colors perceptually
+    closest to hex_code, closest first.
+
+    With wait=False, returns None instead of building the color index on the
+    calling thread; the index is then built in the background.
+    """
+    if _color_index is None and not wait:
+        warm_association_color_index()
+        return None
+    from color_distance import delta_e2000
+    lab = hex_to_lab(hex_code)
+    candidates = get_association_color_index().nearest(hex_code, k * SIMILAR_OVERSAMPLE, exclude_self=True)
+    ranked = sorted(((entry, delta_e2000(lab, hex_to_lab(item_hex))) for entry, item_hex, _ in candidates),
+                    key=lambda pair: pair[1])
+    return ranked[:k]
+
+
+def _update_shared_indexes(changes):
+    """Patch whichever shared indexes have been built with a batch of changes"""
+    # Holding the lock waits out a background build of a shared index, whose
+    # snapshot may predate these changes, before patching it
+    with _shared_index_lock:
+        if _search_index is None and _rainbow_view is None and _color_index is None:
+            return
+        for change in changes:
+            if change.kind == UPSERTED:
+                entry = get_association(change.hex)
+                if entry is None:
+                    continue
+                if _search_index is not None:
+                    _search_index.add(entry)
+                if _rainbow_view is not None:
+                    _rainbow_view.add(entry)
+                if _color_index is not None:
+                    _color_index.add(entry["hex"], entry)
+            elif change.kind == DELETED:
+                for index in (_search_index, _rainbow_view, _color_index):
+                    if index is not None:
+                        index.remove(change.hex)
+
+
+def get_association(hex_code):
+    """Return the association entry for hex_code, or None if there is none"""
+    return get_association_repository().get(hex_code)
+
+
+def get_database_cache_stats():
+    """Return hit/miss counters for the in-memory association cache"""
+    return get_association_repository().stats()
 
 
 def save_to_database(entry):
-    """Save an entry to the associations database"""
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    db = load_database()
-    
-    # Check if entry already exists
-    existing_index = None
-    for i, d in enumerate(db):
-        if d["hex"] == entry["hex"]:
-            existing_index = i
-            break
-    
-    if existing_index is not None:
-        # Update existing entry
-        db[existing_index] = entry
-    else:
-        # Add new entry
-        db.append(entry)
-    
-    # Save to main database
-    with open(DB_PATH, "w") as f:
-        json.dump(db, f, indent=4)
+    """Save an entry to the associations database (insert or update by hex)"""
+    get_association_repository().upsert(entry)
+    publish_changes([DatabaseChange(UPSERTED, entry["hex"])])
 
-    # Save to backup
-    with open("db/associations_backup.json", "w") as f:
-        json.dump(db, f, indent=4)
 
-    # Trigger the callback if it exists
-    callback = get_database_update_callback()
-    if callback:
-        callback()
+def delete_from_database(hex_code):
+    """Delete the entry with the given hex code from the associations database"""
+    get_association_repository().delete(hex_code)
+    publish_changes([DatabaseChange(DELETED, hex_code)])
+
+
+def save_many(entries):
+    """
+    Insert or update many entries (e.g. an import) with one batched write.
+
+    Described colors also leave the save for later list, as they do when
+    described one at a time; both changes go out in one change notification.
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    get_association_repository().upsert_many(entries)
+    changes = [DatabaseChange(UPSERTED, e["hex"]) for e in entries]
+    changes.extend(_remove_saved_for_later(e["hex"] for e in entries))
+    publish_changes(changes)
 
 
 def load_saved_for_later():
-    """Load the save for later database from JSON file"""
-    if os.path.exists(saved_for_later_PATH):
-        try:
-            with open(saved_for_later_PATH, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    return []
-                return json.loads(content)
-        except json.JSONDecodeError:
-            return []
-    return []
+    """Load the save for later database"""
+    return get_saved_for_later_store().all()
+
+
+def load_sorted_saved_for_later():
+    """Load the save for later database in rainbow order"""
+    global _saved_for_later_view
+    if _saved_for_later_view is None:
+        from rainbow_sort import RainbowSortedList
+        _saved_for_later_view = RainbowSortedList(load_saved_for_later())
+    return _saved_for_later_view.entries()
 
 
 def save_to_saved_for_later(entry):
     """Save an entry to the save for later database"""
-    os.makedirs(os.path.dirname(saved_for_later_PATH), exist_ok=True)
-    db = load_saved_for_later()
-    if not any(d["hex"] == entry["hex"] for d in db):
-        db.append(entry)
-        with open(saved_for_later_PATH, "w") as f:
-            json.dump(db, f, indent=4)
+    if get_saved_for_later_store().add(entry):
+        if _saved_for_later_view is not None:
+            _saved_for_later_view.add(entry)
+        publish_changes([DatabaseChange(SAVED_FOR_LATER_CHANGED, entry["hex"])])
 
 
 def remove_from_saved_for_later(hex_code):
     """Remove an entry from the save for later database"""
-    db = load_saved_for_later()
-    db = [entry for entry in db if entry["hex"] != hex_code]
-    with open(saved_for_later_PATH, "w") as f:
-        json.dump(db, f, indent=4)
+    remove_many_from_saved_for_later([hex_code])
+
+
+def remove_many_from_saved_for_later(hex_codes):
+    """Remove several entries from the save for later database in one write"""
+    publish_changes(_remove_saved_for_later(hex_codes))
+
+
+def _remove_saved_for_later(hex_codes):
+    """Remove entries from the save for later database in one write; returns the changes to publish"""
+    removed = get_saved_for_later_store().remove_many(hex_codes)
+    if _saved_for_later_view is not None:
+        for hex_code in removed:
+            _saved_for_later_view.remove(hex_code)
+    return [DatabaseChange(SAVED_FOR_LATER_CHANGED, hex_code) for hex_code in removed]
 
 
 # ---------- UI helpers ----------